@@ -8,29 +8,424 @@ Doc2MD Agent - 核心转换管线
   4. [后处理] 合并片段、生成目录、修复图片路径、打包输出
 """
 
+import functools
+import hashlib
+import heapq
 import json
 import re
 import logging
+import os
 import shutil
+import tempfile
+import threading
+import time
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from itertools import islice
 from pathlib import Path
 from typing import Any, Callable, Optional
 
 from backend.llm_provider import LLMProvider
-from backend.preprocessor import DocPreprocessor, split_content, fix_pandoc_table_codeblocks
+from backend.preprocessor import DocPreprocessor, split_content_with_headings, fix_pandoc_table_codeblocks_with_stats
 from backend.prompts import (
     ANALYZE_STRUCTURE_SYSTEM, ANALYZE_STRUCTURE_USER,
     CONVERT_SYSTEM, CONVERT_USER,
+    CONVERT_BATCH_SYSTEM, CONVERT_BATCH_USER,
     GENERATE_TOC_SYSTEM, GENERATE_TOC_USER,
 )
 
 logger = logging.getLogger(__name__)
 
+# 热路径正则：模块级预编译，避免重复的模式解析与 re 缓存查找
+_RE_ANY_HEADING_PREFIX = re.compile(r'^\s*#{1,6}\s+')
+# 多行版标题行匹配（[^\S\n] 保证空白不跨行，与逐行判定语义一致）
+_RE_ANY_HEADING_LINE_M = re.compile(r'^[^\S\n]*#{1,6}[^\S\n]+([^\n]*)', re.MULTILINE)
+_RE_NUMBERED_HEADING_BODY = re.compile(r'^#{2,6}\s+(.+)$')
+_RE_HEADING_ATTR_TAIL = re.compile(r'\s*\{#[^}]*\}\s*$')
+_RE_JSON_FENCE_BLOCK = re.compile(r'```json\s*\n(.*?)\n```', re.S)
+_RE_FENCE_BLOCK_ANY = re.compile(r'```([^\n`]*)\s*\n(.*?)\n```', re.S)
+_RE_ERROR_CODE = re.compile(r'^\s*\|?\s*(\d{4,6})\s*(?:\||\s{2,})', re.MULTILINE)
+_RE_TRAILING_COMMA = re.compile(r',\s*([}\]])')
+# JSON-like 文本的字符级清洗：NBSP/BOM/全角标点一次 translate 完成
+_JSON_SANITIZE_TABLE = str.maketrans({
+    "\u00a0": " ",
+    "\ufeff": "",
+    "“": '"',
+    "”": '"',
+    "‘": "'",
+    "’": "'",
+    "：": ":",
+    "，": ",",
+})
+_RE_ESCAPED_BRACKET = re.compile(r'\\([\[\]])')
+_RE_SUBHEADING_CAPTURE_M = re.compile(r'^(#{2,6})\s+(.+)$', re.MULTILINE)
+# width/height 属性剥离与图片链接修复合并为一个 alternation，整篇只扫一遍
+_RE_IMG_FIXUP = re.compile(
+    r'(?P<wh>\{width="[^"]*"\s*height="[^"]*"\})|!\[(?P<alt>[^\]]*)\]\((?P<path>[^)]+)\)'
+)
+_RE_MEDIA_MEDIA = re.compile(r'media/media/(\w+\.\w+)')
+_RE_MD_FENCE_OPEN = re.compile(r'^```markdown\s*\n')
+_RE_MD_FENCE_OPEN_WS = re.compile(r'^\s*```markdown\s*\n')
+_RE_FENCE_TAIL = re.compile(r'\n```\s*$')
+_RE_BLANK_RUN = re.compile(r'\n{4,}')
+_RE_MERGE_BROKEN_JSON = re.compile(r'```[ \t\r]*\n[ \t\r\n]*```json[ \t\r]*\n')
+_RE_NUMBERED_HEADING_LINE_M = re.compile(r'^[^\S\n]*#{1,6}[^\S\n]+\d+(?:\.\d+)*[^\S\n]', re.MULTILINE)
+_RE_TITLE_H1_LINE_M = re.compile(r'^# ', re.MULTILINE)
+_RE_SUBHEADING_LINE_M = re.compile(r'^#{2,6}[^\S\n]', re.MULTILINE)
+# 目录块整体形状：可选前置分隔线 + “目录”标题 + 链接列表正文（至少一项，可与空行混排）
+# + 可选收尾分隔线 + 后续空行。[^\S\n] 即“行内空白”，避免 \s 跨行吞并
+_TOC_BLOCK_PATTERN = (
+    r'(?:[^\S\n]*---[^\S\n]*\n(?:[^\S\n]*\n)*)?'
+    r'[^\S\n]*#{1,6}[^\S\n]+目录[^\S\n]*\n'
+    r'(?:[^\S\n]*\n)*'
+    r'(?:[^\S\n]*[-*+][^\S\n]+\[[^\]\n]+\]\(#[^\n]+\)[^\S\n]*(?:\n(?:[^\S\n]*\n)*|\Z))+'
+    r'(?:[^\S\n]*---[^\S\n]*(?:\n|\Z))?'
+    r'(?:[^\S\n]*\n)*(?:[^\S\n]*\Z)?'
+)
+# 两个分支：目录块延伸到文末时连同前一行的换行一起吃掉（等价于按行删除后 join），
+# 否则锚定在行首整块删除
+_RE_TOC_BLOCK = re.compile(
+    rf'\n(?={_TOC_BLOCK_PATTERN}\Z){_TOC_BLOCK_PATTERN}'
+    rf'|(?:\A|(?<=\n)){_TOC_BLOCK_PATTERN}'
+)
+_RE_ANCHOR_INVALID = re.compile(r'[^\w一-鿿\s-]')
+
+
+class _AnchorDeleteTable(dict):
+    """锚点字符删除表：str.translate 用，首次遇到的字符用正则判定一次后缓存。"""
+
+    def __missing__(self, codepoint: int):
+        replacement = None if _RE_ANCHOR_INVALID.match(chr(codepoint)) else codepoint
+        self[codepoint] = replacement
+        return replacement
+
+
+_ANCHOR_DELETE_TABLE = _AnchorDeleteTable()
+# _find_content_start 的候选起点：带锚点标题 / 数字编号标题 / 常见中英文开头
+# 合并为单个 alternation，一次扫描取最早命中的正文起点
+_RE_CONTENT_START = re.compile(r'\n# (?:.+\{#|\d+|引言|Introduction)')
+_RE_NUMBERED_CANDIDATE = re.compile(r'^(\d+(?:\.\d+)*)\s*([、.．\)）])?\s+(.+)$')
+_RE_NUMBERED_SPLIT = re.compile(r'^(\d+(?:\.\d+)*)\s+(.+)$')
+# 分隔线判定合并为单个 alternation：纯分隔符长串 / 管道分隔的 :---: 单元格行
+# （空单元格视同 ---，与旧逐格判定保持一致）
+_RE_TABLE_DELIM_LINE = re.compile(r'[+:=\-\| ]{5,}|\|(?:\s*(?::?-{3,}:?)?\s*\|)*')
+_RE_HEADING_PREFIX = re.compile(r'^\s*#{1,6}\s+')
+_RE_MASKED_LITERAL = re.compile(r'(:\s*)([A-Za-z0-9_./:+-]*[A-Za-z][A-Za-z0-9_./:+-]*)(\s*[,}\]])')
+_RE_MASKED_LITERAL_EOL = re.compile(
+    r'(:\s*)([A-Za-z0-9_./:+-]*[A-Za-z][A-Za-z0-9_./:+-]*)(\s*)(?=\n\s*["\']?[A-Za-z_][A-Za-z0-9_.-]*["\']?\s*:)'
+)
+_RE_TREE_SYMBOL = re.compile(r'[├└]──|├─')
+# 锚点属性剥离与树形符号归一在同一遍扫描里完成（后处理热路径）
+_RE_HEADING_ATTR_OR_TREE = re.compile(r'^(#{1,6}\s+.+?)\s*\{#[^}]*\}\s*$|[├└]──|├─', re.MULTILINE)
+
+# 以下为各热路径中原先以字符串字面量内联调用的模式，统一预编译，
+# 省去每次调用的 re 模块缓存查找与参数检查
+_RE_BOLD_ONLY_LINE = re.compile(r'^\*\*(.+?)\*\*$')
+_RE_LEADING_DIGIT = re.compile(r'^\d')
+_RE_JSON_BLOCK_COMMENT = re.compile(r'/\*[\s\S]*?\*/')
+_RE_JSON_LINE_COMMENT = re.compile(r'^\s*//.*$', re.MULTILINE)
+# 标点后与行首两种未加引号 key 合并为一个 alternation，只扫一遍
+_RE_UNQUOTED_KEY = re.compile(r'([{\[,]\s*|^\s*)([A-Za-z_][A-Za-z0-9_.-]*)(\s*:)', re.MULTILINE)
+_RE_SINGLE_QUOTED_STRING = re.compile(r"'([^'\\]*(?:\\.[^'\\]*)*)'")
+# 先行断言只看一个引号，字符串闭合与冒号在回调里用 _find_string_end 判定，
+# 避免带量词的先行断言对每个候选位置重复扫描整段字符串
+_RE_MISSING_COMMA_BEFORE_KEY = re.compile(
+    r'("(?:[^"\\]|\\.)*"|-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|\btrue\b|\bfalse\b|\bnull\b|[}\]])\s*(?=")'
+)
+_RE_ADJ_OBJECTS = re.compile(r'(\})\s*(\{)')
+_RE_ADJ_ARRAYS = re.compile(r'(\])\s*(\[)')
+_RE_INVALID_JSON_ESCAPE = re.compile(r'\\([^"\\/bfnrtu])')
+_RE_NUMBER_LITERAL = re.compile(r'-?\d+(?:\.\d+)?')
+_RE_BLANK_RUN3 = re.compile(r'\n{3,}')
+_RE_ADJ_BOLD_LINES = re.compile(r'^(\*\*[^*]+\*\*)\n(\*\*[^*]+\*\*)$', re.MULTILINE)
+_RE_GUARD_BULLET_PREFIX = re.compile(r'^\s*[-*+]\s+')
+_RE_GUARD_ORDERED_PREFIX = re.compile(r'^\s*\d+\.\s+')
+_RE_ANCHOR_ATTR_ANY = re.compile(r'\{#[^}]*\}')
+_RE_GUARD_IMAGE = re.compile(r'!\[([^\]]*)\]\(([^)]+)\)')
+_RE_GUARD_MARKUP = re.compile(r'[`*_~]')
+_RE_GUARD_TOKEN = re.compile(r'[\u4e00-\u9fff]{2,}|[A-Za-z][A-Za-z0-9_.:/+\-]{1,}|[0-9]{2,}')
+# 保真校验归一化的融合正则：代码块语言标记/链接/管道/行内标记一次扫描完成
+# （锚点和图片会与其他规则级联，仍作为独立前置替换处理）
+_RE_GUARD_NORMALIZE = re.compile(
+    r'(?P<fence>```(?:json(?:bash)?|bash))'
+    r'|\[(?P<ltext>[^\]]+)\]\((?P<lpath>[^)]+)\)'
+    r'|(?P<pipe>\|)'
+    r'|(?P<markup>[`*_~])'
+)
+
+
+def _clean_guard_fragment(fragment: str) -> str:
+    """清理链接文字片段内部残留的语言标记、管道和行内标记。"""
+    fragment = fragment.replace("```json", "```").replace("```bash", "```")
+    fragment = fragment.replace("|", " ")
+    return _RE_GUARD_MARKUP.sub('', fragment)
+
+
+def _guard_normalize_repl(m: "re.Match[str]") -> str:
+    """融合归一化的替换回调，与原先逐个 re.sub 的顺序语义一致。"""
+    if m.group('fence') is not None or m.group('markup') is not None:
+        return ''
+    ltext = m.group('ltext')
+    if ltext is not None:
+        return _clean_guard_fragment(ltext)
+    return ' '  # 管道替换为空格
+_RE_STRUCT_FENCE_JSON = re.compile(r'```json\s*')
+_RE_STRUCT_FENCE_ANY = re.compile(r'```\s*')
+_RE_OUTER_JSON_OBJECT = re.compile(r'\{[\s\S]*\}')
+_RE_TRAILING_COMMA_CLOSE = re.compile(r',\s*([\]}])')
+_RE_TREE_ROW_PREFIX = re.compile(r'^\s*[└├]─')
+_RE_TREE_ROW_PREFIX_STRIP = re.compile(r'^\s*[└├]─\s*')
+_RE_TREE_INDENT_PREFIX = re.compile(r'^(\s*)[└├]─')
+_RE_TREE_MARKER = re.compile(r'[└├]─')
+_RE_SUBHEADING_PREFIX = re.compile(r'^\s*#{2,6}\s+')
+_RE_FENCE_OPEN_LINE = re.compile(r'^(`{3,})([A-Za-z0-9_-]*)\s*$')
+_RE_PIPE_GRID_BORDER = re.compile(r'^\|\s*\+-+')
+_RE_GRID_BORDER_PREFIX = re.compile(r'^\+-+')
+_RE_NESTED_GRID_ROW = re.compile(r'^\|\s*\|\s*([^|]+?)\s*\|\s*([^|]+?)\s*\|\s*([^|]+?)\s*\|$')
+_RE_GRID_BORDER_ANY = re.compile(r'^\+[:=\-]+')
+_RE_GRID_FILLER_CELL = re.compile(r'[:=\-+ ]*')
+_RE_TAB_SPLIT = re.compile(r'\t+')
+_RE_WIDE_GAP_SPLIT = re.compile(r'\s{2,}')
+_RE_ORDERED_ITEM_PREFIX = re.compile(r'^\d+\.\s+')
+_RE_REQUIRED_FLAG_PREFIX = re.compile(r'^(是/否|否/是|是|否)(.*)$')
+_RE_CLI_LONG_OPTION = re.compile(r'^\\?--[A-Za-z0-9_-]+')
+_RE_CLI_SHORT_OPTION = re.compile(r'^\\?-[A-Za-z]\b')
+_RE_CURL_LINE = re.compile(r'^\s*curl\b')
+_RE_BATCH_OUT_BLOCK = re.compile(r'<<<OUT id=(\d+)>>>\s*\n?(.*?)\n?<<<ENDOUT id=\1>>>', re.S)
+_HIER_PARENT_PATTERNS = (
+    re.compile(
+        r'^(?:请求参数|返回参数|入参|出参|request|response)?\s*'
+        r'(?:`)?([A-Za-z0-9_\-\u4e00-\u9fff.\[\]]+)(?:`)?\s*'
+        r'(?:对象|参数|字段)?\s*(?:字段|参数)?\s*(?:说明|结构|详情|定义)\s*[:：]?$',
+        flags=re.IGNORECASE,
+    ),
+    re.compile(
+        r'^(?:`)?([A-Za-z0-9_\-\u4e00-\u9fff.\[\]]+)(?:`)?\s*'
+        r'(?:对象)?\s*(?:字段|参数)\s*[:：]$',
+        flags=re.IGNORECASE,
+    ),
+)
+_RE_API_LABEL_LINE = re.compile(
+    r'^\s*(接口地址|请求方式|接口描述|请求参数|返回参数|请求示例|返回示例|响应示例|接口说明|注意事项|注意)\s*[：:]\s*(.*)$'
+)
+_RE_API_BOLD_LABEL_LINE = re.compile(
+    r'^\s*\*\*(接口地址|请求方式|接口描述|请求参数|返回参数|请求示例|返回示例|响应示例|接口说明|注意事项|注意)\s*[：:]\*\*\s*(.*)$'
+)
+_RE_MAILTO_LINK = re.compile(r'\[\s*([^\]]+?)\s*[，,]?\s*\]\(\s*mailto:[^)]+\)', re.IGNORECASE)
+_RE_NORMALIZABLE_FENCE = re.compile(r'```([A-Za-z0-9_-]*)\s*\n([\s\S]*?)\n```')
+# JSON 修复的逐字符扫描改为“跳到下一个关键字符”：仅这些字符影响状态机
+_RE_JSON_SPECIAL = re.compile(r'["{}\[\]\\]')
+_RE_STRING_SPECIAL = re.compile(r'["\\]')
+_JSON_OPEN_TO_CLOSE = {"{": "}", "[": "]"}
+_JSON_CLOSE_TO_OPEN = {"}": "{", "]": "["}
+
+
+def _find_string_end(text: str, start: int, quote: str = '"') -> int:
+    """返回 JSON 字符串结束引号之后的下标；未闭合返回 -1。
+
+    引号是否生效按其前连续反斜杠个数的奇偶判定，与逐字符 escaped
+    标志位的语义一致。
+    """
+    k = start
+    while True:
+        q = text.find(quote, k)
+        if q == -1:
+            return -1
+        b = q - 1
+        while b >= start and text[b] == '\\':
+            b -= 1
+        if (q - 1 - b) % 2 == 0:
+            return q + 1
+        k = q + 1
+
+
+# _json_repair_pass 的标识符/空白字符集（bare key 允许点和连字符，与原正则一致）
+_JSON_IDENT_START = frozenset('ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz_')
+_JSON_IDENT_CHARS = _JSON_IDENT_START | frozenset('0123456789.-')
+_JSON_WS = ' \t\r\x0b\x0c'
+
+
+def _strip_attr_or_normalize_tree(match: re.Match) -> str:
+    heading = match.group(1)
+    if heading is not None:
+        # 标题行整体被吃掉时，行内可能同样含树形符号
+        return _RE_TREE_SYMBOL.sub('└─', heading)
+    return '└─'
+_RE_FENCE_LINE_M = re.compile(r'^[ \t]*```[^\n]*\n?', re.MULTILINE)
+_RE_TOC_LINE_M = re.compile(r'^[^\S\n]*\[(\d+(?:\.\d+)*\s+.+?)\s+\[\d+\]\(#', re.MULTILINE)
+_RE_FIRST_H1_M = re.compile(r'^[^\S\n]*# ', re.MULTILINE)
+_RE_SECTION_SPLIT = re.compile(r'(?m)(?=^[^\S\n]*#[^\S\n])')
+_RE_WHITESPACE = re.compile(r'\s+')
+
+
+try:
+    import orjson
+
+    def _json_loads(text: str) -> Any:
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            # orjson 更严格（如超长整数、尾随空白差异），以 stdlib 的结果/报错为准
+            return json.loads(text)
+
+    def _json_dumps_pretty(obj: Any) -> str:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2).decode("utf-8")
+
+except ImportError:
+    orjson = None
+
+    def _json_loads(text: str) -> Any:
+        return json.loads(text)
+
+    def _json_dumps_pretty(obj: Any) -> str:
+        return json.dumps(obj, ensure_ascii=False, indent=2)
+
+
+@functools.lru_cache(maxsize=4096)
+def _normalize_heading_text(heading: str) -> str:
+    """标题比较归一化：忽略空白差异。同一标题在各分片校验中反复出现，带缓存。"""
+    return _RE_WHITESPACE.sub('', heading.strip())
+
+
+@functools.lru_cache(maxsize=4096)
+def _strip_heading_attrs(title: str) -> str:
+    """去除标题中残留的 {#xxx} 等属性。同一标题在校验与目录生成中反复清洗，带缓存。"""
+    return _RE_HEADING_ATTR_TAIL.sub('', title).strip()
+
+
+def _collect_subheadings(markdown: str) -> list[tuple[int, str]]:
+    """单遍提取 2~6 级标题（去属性、跳过“目录”），目录生成的两条路径共用。"""
+    headings = []
+    append = headings.append
+    strip_attrs = _strip_heading_attrs
+    for match in _RE_SUBHEADING_CAPTURE_M.finditer(markdown):
+        title = strip_attrs(match.group(2).strip())
+        if title != "目录":
+            append((len(match.group(1)), title))
+    return headings
+
+
+@functools.lru_cache(maxsize=1024)
+def _normalize_heading_set(headings: tuple[str, ...]) -> frozenset[str]:
+    """归一化标题集合。同一 allowed_headings 会在每次分片重试时反复校验，按元组缓存。"""
+    return frozenset(_normalize_heading_text(heading) for heading in headings if heading)
+
+
+@functools.lru_cache(maxsize=4096)
+def _extract_section_id(numbered_heading: str) -> str:
+    """提取编号标题的章节号前缀（如 "2.1 鉴权" → "2.1"）。纯字符串切分，免正则。"""
+    parts = numbered_heading.split(None, 1)
+    if len(parts) != 2:
+        return ""
+    segments = parts[0].split(".")
+    if all(segments) and all(seg.isdecimal() for seg in segments):
+        return parts[0]
+    return ""
+
+
+@functools.lru_cache(maxsize=4096)
+def _strip_heading_number_prefix(heading: str) -> str:
+    """去掉标题的章节号前缀（"2.1 鉴权" → "鉴权"）。同一标题反复比对，带缓存。"""
+    stripped = heading.strip()
+    section_id = _extract_section_id(stripped)
+    if not section_id:
+        return stripped
+    return stripped[len(section_id):].lstrip()
+
+
+@functools.lru_cache(maxsize=4096)
+def _heading_level_from_section_id(section_id: str) -> int:
+    """章节号 → 标题层级（"2.1" → 3）。同一章节号在各分片中反复换算，带缓存。"""
+    if not section_id:
+        return 2
+    return min(6, section_id.count(".") + 2)
+
+
+# 行内可出现的空白字符（split("\n") 之后 \n 不会出现在行内）
+_HEADING_SPACE = " \t\r\x0b\x0c"
+
+
+def _is_h1_line(line: str) -> bool:
+    """等价于 `^\\s*#\\s+` 判定：`#` 后跟空白。纯字符串判定，热循环里免正则。"""
+    s = line.lstrip()
+    return len(s) > 1 and s[0] == "#" and s[1] in _HEADING_SPACE
+
+
+def _is_table_delim_cell(cell: str) -> bool:
+    """表格分隔单元格判定，等价于 `:?-{3,}:?` 的全匹配。纯字符串操作免正则。"""
+    if cell.startswith(":"):
+        cell = cell[1:]
+    if cell.endswith(":"):
+        cell = cell[:-1]
+    return len(cell) >= 3 and not cell.strip("-")
+
+
+def _leading_hashes(line: str) -> int:
+    """标题行返回 `#` 个数（1~6），其余行返回 0。等价于 `^\\s*#{1,6}\\s+.+$` 的判定。"""
+    s = line.lstrip()
+    i = 0
+    n = len(s)
+    while i < 6 and i < n and s[i] == "#":
+        i += 1
+    if i and i + 1 < n and s[i] in _HEADING_SPACE:
+        return i
+    return 0
+
+
+def _count_h1_outside_fences(markdown: str) -> int:
+    """统计代码块之外的一级标题行数。单遍状态机扫描，不构造去代码副本。"""
+    in_fence = False
+    count = 0
+    for line in _iter_lines(markdown):
+        if line.lstrip(" \t").startswith("```"):
+            in_fence = not in_fence
+            continue
+        if in_fence or not line.startswith("#"):
+            continue
+        # 等价于 ^#\s+.+$：# 后至少一个空白字符，且该行还有后续内容
+        body = line[1:]
+        if len(body) >= 2 and body[0] in " \t\r\x0b\x0c":
+            count += 1
+    return count
+
+
+def _iter_lines(text: str):
+    """惰性按行迭代（等价于 split("\\n")），避免为大文档一次性分配完整行列表。"""
+    start = 0
+    length = len(text)
+    find = text.find
+    while start <= length:
+        end = find("\n", start)
+        if end == -1:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
 
 class TaskStoppedError(RuntimeError):
     """任务被用户停止。"""
 
 
+class _RpmLimiter:
+    """简单的 RPM 限速器：多线程共享，按请求间隔节流。"""
+
+    def __init__(self, rpm_limit: int):
+        self._interval = 60.0 / max(1, rpm_limit)
+        self._lock = threading.Lock()
+        self._next_allowed = 0.0
+
+    def acquire(self) -> None:
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self._next_allowed:
+                    self._next_allowed = now + self._interval
+                    return
+                wait = self._next_allowed - now
+            time.sleep(wait)
+
+
 class Doc2MDAgent:
     """文档转 Markdown 智能体"""
 
@@ -52,18 +447,30 @@ class Doc2MDAgent:
         self.chunk_strategy = self.conv_config.get("chunk_strategy", "section")
         self.max_chunk_retries = self.conv_config.get("max_chunk_retries", 2)
         self.deterministic_toc = self.conv_config.get("deterministic_toc", True)
+        self.toc_llm_threshold = int(self.conv_config.get("toc_llm_threshold", 15))
         self.max_validation_report_items = self.conv_config.get("max_validation_report_items", 8)
         self.allow_partial_on_chunk_failure = self.conv_config.get("allow_partial_on_chunk_failure", True)
         self.allow_partial_on_validation_failure = self.conv_config.get("allow_partial_on_validation_failure", True)
+        self.partial_preview_full_postprocess = self.conv_config.get("partial_preview_full_postprocess", False)
         self.min_content_token_coverage = float(self.conv_config.get("min_content_token_coverage", 0.82))
         self.min_content_char_ratio = float(self.conv_config.get("min_content_char_ratio", 0.62))
         self.content_guard_min_tokens = int(self.conv_config.get("content_guard_min_tokens", 20))
+        self.max_parallel_chunks = max(1, int(self.conv_config.get("max_parallel_chunks", 8)))
+        self.max_batch_chunks = max(1, int(self.conv_config.get("max_batch_chunks", 1)))
+        rpm_limit = int(self.conv_config.get("rpm_limit", 0) or 0)
+        self._rpm_limiter = _RpmLimiter(rpm_limit) if rpm_limit > 0 else None
+        self.cache_enabled = bool(self.conv_config.get("cache_enabled", False))
+        cache_dir = self.conv_config.get("cache_dir", "") or str(Path.home() / ".doc2md" / "llm_cache")
+        self._llm_cache_dir = Path(cache_dir)
 
     def _emit_event(self, payload: dict[str, Any]) -> None:
         if self.event_callback:
             self.event_callback(payload)
 
     def _emit_logic_event(self, message: str, event_type: str = "pipeline_detail", **details: Any) -> None:
+        # 没有监听方时直接返回，省去构建 payload 字典的开销
+        if not self.event_callback:
+            return
         payload: dict[str, Any] = {
             "type": event_type,
             "message": message,
@@ -165,24 +572,27 @@ class Doc2MDAgent:
             image_count=len(images),
         )
 
-        # 预处理：将 pandoc 单列表格（含 JSON 等）转为代码块
-        json_blocks_before_fix = len(self._extract_json_blocks(raw_md))
-        raw_md = fix_pandoc_table_codeblocks(raw_md)
-        json_blocks_after_fix = len(self._extract_json_blocks(raw_md))
-        logger.info("已完成 pandoc 表格代码块修复")
-        self._report_progress(progress_callback, "preprocess", 3, 4, "预处理中：修复表格中的代码块")
-        self._emit_logic_event(
-            (
-                "表格代码块修复完成："
-                f"json 代码块 {json_blocks_before_fix} -> {json_blocks_after_fix}"
-            ),
-            event_type="preprocess_detail",
-            json_blocks_before=json_blocks_before_fix,
-            json_blocks_after=json_blocks_after_fix,
-        )
+        # 整理图片是文件拷贝 I/O，与纯 CPU 的表格代码块修复并行执行
+        with ThreadPoolExecutor(max_workers=1) as image_pool:
+            image_future = image_pool.submit(preprocessor.organize_images, output_dir, images)
+
+            # 预处理：将 pandoc 单列表格（含 JSON 等）转为代码块
+            json_blocks_before_fix = len(self._extract_json_blocks(raw_md))
+            raw_md, json_blocks_added = fix_pandoc_table_codeblocks_with_stats(raw_md)
+            json_blocks_after_fix = json_blocks_before_fix + json_blocks_added
+            logger.info("已完成 pandoc 表格代码块修复")
+            self._report_progress(progress_callback, "preprocess", 3, 4, "预处理中：修复表格中的代码块")
+            self._emit_logic_event(
+                (
+                    "表格代码块修复完成："
+                    f"json 代码块 {json_blocks_before_fix} -> {json_blocks_after_fix}"
+                ),
+                event_type="preprocess_detail",
+                json_blocks_before=json_blocks_before_fix,
+                json_blocks_after=json_blocks_after_fix,
+            )
 
-        # 整理图片
-        image_mapping = preprocessor.organize_images(output_dir, images)
+            image_mapping = image_future.result()
         logger.info(f"图片路径映射: {image_mapping}")
         self._report_progress(
             progress_callback,
@@ -264,18 +674,16 @@ class Doc2MDAgent:
                     "section_heading": "",
                     "allowed_headings": [],
                     "continuation_mode": False,
-                    "chunk_has_heading": bool(re.search(r'^\s*#\s+', chunk, flags=re.MULTILINE)),
+                    "chunk_has_heading": chunk_has_heading,
                     "previous_heading": "",
                     "next_heading": "",
                 }
-                for idx, chunk in enumerate(split_content(content_body, self.chunk_size))
+                for idx, (chunk, chunk_has_heading) in enumerate(split_content_with_headings(content_body, self.chunk_size))
             ]
 
         if not chunk_jobs:
             raise RuntimeError("正文切分失败：未生成任何分片")
 
-        converted_chunks = []
-        chunk_fallback_count = 0
         partial_preview_file = output_dir / ".partial_preview.md"
         partial_preview_file.write_text("", encoding="utf-8")
         planned_llm_calls = len(chunk_jobs)
@@ -302,91 +710,91 @@ class Doc2MDAgent:
             continuation_chunks=continuation_chunks,
         )
 
-        for i, job in enumerate(chunk_jobs):
-            self._check_stop()
-            chunk = job["content"]
-            section_label = self._resolve_section_label(
-                section_id=job["section_id"],
-                section_heading=job.get("section_heading", ""),
-            )
-            logger.info(
-                "正在转换第 %s/%s 个片段（section=%s, section_label=%s, continuation=%s, %s 字符）",
-                i + 1,
-                len(chunk_jobs),
-                job["section_id"],
-                section_label,
-                job["continuation_mode"],
-                len(chunk),
-            )
-            self._emit_logic_event(
-                (
-                    f"开始处理分片 {i + 1}/{len(chunk_jobs)}：章节={section_label}，section={job['section_id']}，"
-                    f"continuation={job['continuation_mode']}，allowed_headings={job['allowed_headings'] or '(none)'}，"
-                    f"chars={len(chunk)}"
-                ),
-                event_type="chunk_started",
-                chunk_index=i + 1,
-                total_chunks=len(chunk_jobs),
-                section_id=job["section_id"],
-                section_heading=job.get("section_heading", ""),
-                section_label=section_label,
-                continuation_mode=job["continuation_mode"],
-                chunk_chars=len(chunk),
-            )
-            self._report_progress(
-                progress_callback,
-                "convert",
-                i,
-                len(chunk_jobs),
-                f"AI 转换中：准备处理第 {i+1}/{len(chunk_jobs)} 个分片（{section_label}，{len(chunk)} 字符）",
-            )
-            converted, convert_meta = self._convert_chunk_with_retry(
-                chunk=chunk,
-                structure=structure,
-                chunk_index=i + 1,
-                total_chunks=len(chunk_jobs),
-                section_id=job["section_id"],
-                section_heading=job["section_heading"],
-                section_label=section_label,
-                allowed_headings=job["allowed_headings"],
-                continuation_mode=job["continuation_mode"],
-                chunk_has_heading=job["chunk_has_heading"],
-                previous_heading=job["previous_heading"],
-                next_heading=job["next_heading"],
-            )
-            converted_chunks.append(converted)
-            partial_preview_md = self._build_partial_preview_markdown(converted_chunks)
-            partial_preview_file.write_text(partial_preview_md, encoding="utf-8")
-            if convert_meta.get("fallback_used"):
-                chunk_fallback_count += 1
+        self._report_progress(
+            progress_callback,
+            "convert",
+            0,
+            len(chunk_jobs),
+            f"AI 转换中：并发处理 {len(chunk_jobs)} 个分片（并发数 {min(self.max_parallel_chunks, len(chunk_jobs))}）",
+        )
+
+        # 各分片互相独立（校验只依赖自身 source_chunk 与 allowed_headings），
+        # 使用有界线程池并发转换，结果按分片下标回填以保持拼接顺序。
+        chunk_results: list[tuple[str, dict[str, Any]] | None] = [None] * len(chunk_jobs)
+        completed_chunks = 0
+        preview_ready = 0
+        preview_written = 0
+        chunk_batches = self._plan_chunk_batches(chunk_jobs)
+        if any(len(batch) > 1 for batch in chunk_batches):
             self._emit_logic_event(
                 (
-                    f"分片 {i + 1}/{len(chunk_jobs)} 完成：章节={section_label}，attempts={convert_meta.get('attempts_used', 1)}，"
-                    f"json_source={convert_meta.get('source_json_blocks', 0)}，"
-                    f"json_repaired={convert_meta.get('repaired_json_blocks', 0)}，"
-                    f"json_fallback={convert_meta.get('fallback_json_blocks', 0)}，"
-                    f"chunk_fallback={bool(convert_meta.get('fallback_used', False))}"
+                    f"小分片批量合并：{len(chunk_jobs)} 个分片按最多 {self.max_batch_chunks} 个/请求"
+                    f"合并为 {len(chunk_batches)} 次调用"
                 ),
-                event_type="chunk_completed",
-                chunk_index=i + 1,
-                total_chunks=len(chunk_jobs),
-                section_id=job["section_id"],
-                section_heading=job.get("section_heading", ""),
-                section_label=section_label,
-                attempts_used=convert_meta.get("attempts_used", 1),
-                source_json_blocks=convert_meta.get("source_json_blocks", 0),
-                repaired_json_blocks=convert_meta.get("repaired_json_blocks", 0),
-                fallback_json_blocks=convert_meta.get("fallback_json_blocks", 0),
-                fallback_used=bool(convert_meta.get("fallback_used", False)),
-                fallback_reason=convert_meta.get("fallback_reason"),
-            )
-            self._report_progress(
-                progress_callback,
-                "convert",
-                i + 1,
-                len(chunk_jobs),
-                f"AI 转换中：已完成第 {i+1}/{len(chunk_jobs)} 个分片（{section_label}）",
+                event_type="chunk_batch_plan",
+                chunk_count=len(chunk_jobs),
+                batch_count=len(chunk_batches),
+                max_batch_chunks=self.max_batch_chunks,
             )
+        # 热循环里反复用到的量提前绑定为局部变量，避免每次迭代重复求值
+        total_chunks = len(chunk_jobs)
+        with ThreadPoolExecutor(max_workers=min(self.max_parallel_chunks, total_chunks)) as executor:
+            future_to_batch = {}
+            for batch in chunk_batches:
+                if len(batch) == 1:
+                    i = batch[0]
+                    future = executor.submit(self._run_chunk_job, i, chunk_jobs[i], total_chunks, structure)
+                else:
+                    future = executor.submit(self._run_batch_job, batch, chunk_jobs, total_chunks, structure)
+                future_to_batch[future] = batch
+            try:
+                for future in as_completed(future_to_batch):
+                    batch = future_to_batch[future]
+                    if len(batch) == 1:
+                        chunk_results[batch[0]] = future.result()
+                    else:
+                        for pos, idx in enumerate(batch):
+                            chunk_results[idx] = future.result()[pos]
+                    completed_chunks += len(batch)
+                    i = batch[-1]
+
+                    # 实时预览只写“已连续完成”的前缀，保证内容顺序稳定
+                    while preview_ready < len(chunk_results) and chunk_results[preview_ready] is not None:
+                        preview_ready += 1
+                    if preview_ready > preview_written:
+                        if self.partial_preview_full_postprocess:
+                            partial_preview_md = self._build_partial_preview_markdown(
+                                [result[0] for result in chunk_results[:preview_ready]]
+                            )
+                            partial_preview_file.write_text(partial_preview_md, encoding="utf-8")
+                        else:
+                            # 默认增量追加新就绪的分片，预览写入成本从 O(N^2) 降为 O(N)
+                            with partial_preview_file.open("a", encoding="utf-8") as preview_fp:
+                                for ready_idx in range(preview_written, preview_ready):
+                                    if ready_idx > 0:
+                                        preview_fp.write("\n\n")
+                                    preview_fp.write(chunk_results[ready_idx][0])
+                        preview_written = preview_ready
+
+                    section_label = self._resolve_section_label(
+                        section_id=chunk_jobs[i]["section_id"],
+                        section_heading=chunk_jobs[i].get("section_heading", ""),
+                    )
+                    self._report_progress(
+                        progress_callback,
+                        "convert",
+                        completed_chunks,
+                        total_chunks,
+                        f"AI 转换中：已完成 {completed_chunks}/{total_chunks} 个分片（{section_label}）",
+                    )
+            except BaseException:
+                for pending in future_to_batch:
+                    pending.cancel()
+                raise
+
+        chunk_fallback_count = sum(
+            1 for result in chunk_results if result is not None and result[1].get("fallback_used")
+        )
 
         self._check_stop()
         if chunk_fallback_count > 0:
@@ -406,12 +814,15 @@ class Doc2MDAgent:
         logger.info("=" * 50)
         self._check_stop()
 
-        # 合并所有片段
-        full_md = "\n\n".join(converted_chunks)
+        # 合并所有片段（直接从结果槽位生成，省掉一份完整的分片列表拷贝）
+        merged_chunk_count = sum(1 for result in chunk_results if result is not None)
+        full_md = "\n\n".join(result[0] for result in chunk_results if result is not None)
+        # 合并后立即释放分片缓冲，避免后处理期间文档内容在内存里保留两份
+        chunk_results = None
         self._emit_logic_event(
-            f"后处理：已合并 {len(converted_chunks)} 个分片，正文长度 {len(full_md)} 字符",
+            f"后处理：已合并 {merged_chunk_count} 个分片，正文长度 {len(full_md)} 字符",
             event_type="postprocess_detail",
-            merged_chunks=len(converted_chunks),
+            merged_chunks=merged_chunk_count,
             merged_chars=len(full_md),
         )
         full_md = self._postprocess_markdown(
@@ -446,10 +857,16 @@ class Doc2MDAgent:
                     reason=validation_warning,
                 )
 
-        # 写入输出文件
+        # 写入输出文件（显式大缓冲写，避免小块刷盘）
         stem = input_path.stem
         output_file = output_dir / f"{stem}.md"
-        output_file.write_text(full_md, encoding="utf-8")
+        with open(output_file, "w", encoding="utf-8", buffering=1 << 20) as fh:
+            fh.write(full_md)
+            fh.flush()
+            if hasattr(os, "posix_fadvise"):
+                # 输出文件写完后不会再被读取，提示内核尽早释放对应页缓存
+                os.fsync(fh.fileno())
+                os.posix_fadvise(fh.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
 
         # 清理工作目录
         shutil.rmtree(work_dir, ignore_errors=True)
@@ -492,6 +909,235 @@ class Doc2MDAgent:
     # 内部方法
     # ----------------------------------------------------------
 
+    def _run_chunk_job(
+        self,
+        index: int,
+        job: dict[str, Any],
+        total_chunks: int,
+        structure: dict,
+    ) -> tuple[str, dict[str, Any]]:
+        """执行单个分片转换任务（线程池 worker 入口）。"""
+        self._check_stop()
+        chunk = job["content"]
+        section_label = self._resolve_section_label(
+            section_id=job["section_id"],
+            section_heading=job.get("section_heading", ""),
+        )
+        logger.info(
+            "正在转换第 %s/%s 个片段（section=%s, section_label=%s, continuation=%s, %s 字符）",
+            index + 1,
+            total_chunks,
+            job["section_id"],
+            section_label,
+            job["continuation_mode"],
+            len(chunk),
+        )
+        self._emit_logic_event(
+            (
+                f"开始处理分片 {index + 1}/{total_chunks}：章节={section_label}，section={job['section_id']}，"
+                f"continuation={job['continuation_mode']}，allowed_headings={job['allowed_headings'] or '(none)'}，"
+                f"chars={len(chunk)}"
+            ),
+            event_type="chunk_started",
+            chunk_index=index + 1,
+            total_chunks=total_chunks,
+            section_id=job["section_id"],
+            section_heading=job.get("section_heading", ""),
+            section_label=section_label,
+            continuation_mode=job["continuation_mode"],
+            chunk_chars=len(chunk),
+        )
+        converted, convert_meta = self._convert_chunk_with_retry(
+            chunk=chunk,
+            structure=structure,
+            chunk_index=index + 1,
+            total_chunks=total_chunks,
+            section_id=job["section_id"],
+            section_heading=job["section_heading"],
+            section_label=section_label,
+            allowed_headings=job["allowed_headings"],
+            continuation_mode=job["continuation_mode"],
+            chunk_has_heading=job["chunk_has_heading"],
+            previous_heading=job["previous_heading"],
+            next_heading=job["next_heading"],
+        )
+        self._emit_logic_event(
+            (
+                f"分片 {index + 1}/{total_chunks} 完成：章节={section_label}，attempts={convert_meta.get('attempts_used', 1)}，"
+                f"json_source={convert_meta.get('source_json_blocks', 0)}，"
+                f"json_repaired={convert_meta.get('repaired_json_blocks', 0)}，"
+                f"json_fallback={convert_meta.get('fallback_json_blocks', 0)}，"
+                f"chunk_fallback={bool(convert_meta.get('fallback_used', False))}"
+            ),
+            event_type="chunk_completed",
+            chunk_index=index + 1,
+            total_chunks=total_chunks,
+            section_id=job["section_id"],
+            section_heading=job.get("section_heading", ""),
+            section_label=section_label,
+            attempts_used=convert_meta.get("attempts_used", 1),
+            source_json_blocks=convert_meta.get("source_json_blocks", 0),
+            repaired_json_blocks=convert_meta.get("repaired_json_blocks", 0),
+            fallback_json_blocks=convert_meta.get("fallback_json_blocks", 0),
+            fallback_used=bool(convert_meta.get("fallback_used", False)),
+            fallback_reason=convert_meta.get("fallback_reason"),
+        )
+        return converted, convert_meta
+
+    def _is_batchable_chunk_job(self, job: dict[str, Any]) -> bool:
+        """
+        判断分片能否参与批量合并请求：
+        - 含 JSON 代码块的分片必须走单片路径（保证源 JSON 回填语义）
+        - 过大的分片合并后容易超出模型输出窗口，不参与
+        """
+        content = job["content"]
+        if "```json" in content:
+            return False
+        return len(content) * 2 <= self.chunk_size
+
+    def _plan_chunk_batches(self, chunk_jobs: list[dict[str, Any]]) -> list[list[int]]:
+        """把相邻的小分片合并为批量请求（row-marshaling），其余保持单片。"""
+        batches: list[list[int]] = []
+        current: list[int] = []
+        current_chars = 0
+
+        def flush() -> None:
+            nonlocal current, current_chars
+            if current:
+                batches.append(current)
+                current = []
+                current_chars = 0
+
+        for i, job in enumerate(chunk_jobs):
+            if self.max_batch_chunks <= 1 or not self._is_batchable_chunk_job(job):
+                flush()
+                batches.append([i])
+                continue
+            if current and (
+                len(current) >= self.max_batch_chunks
+                or current_chars + len(job["content"]) > self.chunk_size
+            ):
+                flush()
+            current.append(i)
+            current_chars += len(job["content"])
+
+        flush()
+        return batches
+
+    def _run_batch_job(
+        self,
+        indices: list[int],
+        chunk_jobs: list[dict[str, Any]],
+        total_chunks: int,
+        structure: dict,
+    ) -> list[tuple[str, dict[str, Any]]]:
+        """
+        一次请求转换多个小分片：
+        - 输入/输出都用 `<<<CHUNK id=N>>>` / `<<<OUT id=N>>>` 哨兵包裹
+        - 任一分片缺失或校验失败时，自动回退该分片的单片重试路径
+        """
+        self._check_stop()
+        self._emit_logic_event(
+            f"批量转换开始：合并分片 {[i + 1 for i in indices]}（共 {len(indices)} 个）",
+            event_type="chunk_batch_started",
+            chunk_indices=[i + 1 for i in indices],
+            total_chunks=total_chunks,
+        )
+
+        overview_lines = []
+        content_parts = []
+        for i in indices:
+            job = chunk_jobs[i]
+            overview_lines.append(
+                f"- id={i + 1}: section_id={job['section_id'] or '(none)'}, "
+                f"section_heading={job.get('section_heading') or '(none)'}, "
+                f"continuation_mode={str(job['continuation_mode']).lower()}, "
+                f"allowed_headings={', '.join(job['allowed_headings']) if job['allowed_headings'] else '(none)'}"
+            )
+            content_parts.append(f"<<<CHUNK id={i + 1}>>>\n{job['content']}\n<<<END id={i + 1}>>>")
+
+        prompt = CONVERT_BATCH_USER.format(
+            structure=_json_dumps_pretty(structure),
+            jobs_overview="\n".join(overview_lines),
+            job_count=len(indices),
+            content="\n\n".join(content_parts),
+        )
+
+        segments: dict[int, str] = {}
+        response: dict[str, Any] = {"truncated": True}
+        try:
+            if self._rpm_limiter:
+                self._rpm_limiter.acquire()
+            response = self._chat_with_meta_cached(
+                CONVERT_BATCH_SYSTEM,
+                prompt,
+                context={
+                    "operation": "convert_chunk",
+                    "chunk_index": indices[0] + 1,
+                    "total_chunks": total_chunks,
+                    "section_id": chunk_jobs[indices[0]]["section_id"],
+                    "section_label": f"批量分片 {[i + 1 for i in indices]}",
+                },
+            )
+            if not response.get("truncated"):
+                for match in _RE_BATCH_OUT_BLOCK.finditer(response.get("content", "")):
+                    segments[int(match.group(1))] = match.group(2)
+        except TaskStoppedError:
+            raise
+        except Exception as exc:
+            logger.warning("批量转换调用失败，回退单片路径: %s", exc)
+            self._emit_logic_event(
+                f"批量转换调用失败，回退单片路径：{exc}",
+                event_type="chunk_batch_failed",
+                chunk_indices=[i + 1 for i in indices],
+                reason=str(exc),
+            )
+
+        results: list[tuple[str, dict[str, Any]]] = []
+        for i in indices:
+            job = chunk_jobs[i]
+            section_label = self._resolve_section_label(
+                section_id=job["section_id"],
+                section_heading=job.get("section_heading", ""),
+            )
+            segment = segments.get(i + 1)
+            if segment is not None:
+                converted, merged_meta, valid, reason = self._postvalidate_chunk_output(
+                    chunk=job["content"],
+                    converted=segment,
+                    llm_meta=response,
+                    attempt_no=1,
+                    chunk_index=i + 1,
+                    total_chunks=total_chunks,
+                    section_id=job["section_id"],
+                    section_heading=job.get("section_heading", ""),
+                    section_label=section_label,
+                    allowed_headings=job["allowed_headings"],
+                    continuation_mode=job["continuation_mode"],
+                    chunk_has_heading=job["chunk_has_heading"],
+                )
+                if valid:
+                    merged_meta["batched"] = True
+                    results.append((converted, merged_meta))
+                    continue
+                self._emit_logic_event(
+                    f"批量分片 {i + 1}/{total_chunks} 校验未通过，回退单片路径：{reason}",
+                    event_type="chunk_batch_segment_rejected",
+                    chunk_index=i + 1,
+                    total_chunks=total_chunks,
+                    reason=reason,
+                )
+            else:
+                self._emit_logic_event(
+                    f"批量输出缺失分片 {i + 1}/{total_chunks} 的结果，回退单片路径",
+                    event_type="chunk_batch_segment_missing",
+                    chunk_index=i + 1,
+                    total_chunks=total_chunks,
+                )
+            results.append(self._run_chunk_job(i, job, total_chunks, structure))
+
+        return results
+
     def _build_partial_preview_markdown(self, converted_chunks: list[str]) -> str:
         """
         基于当前已完成分片生成“可读的实时预览”内容。
@@ -542,68 +1188,73 @@ class Doc2MDAgent:
                 mapping_count=len(image_mapping),
             )
 
-        # 清除标题中的 {#xxx} 锚点属性（pandoc / AI 残留）
-        full_md = re.sub(
-            r'^(#{1,6}\s+.+?)\s*\{#[^}]*\}\s*$',
-            r'\1',
-            full_md,
-            flags=re.MULTILINE,
-        )
-
+        # 清除标题中的 {#xxx} 锚点属性（pandoc / AI 残留），同一遍扫描里
         # 统一表格中的树形符号：├── / └── → └─
-        full_md = full_md.replace('├──', '└─')
-        full_md = full_md.replace('└──', '└─')
-        full_md = full_md.replace('├─', '└─')
+        # 先用 in 做廉价预检：多数文档没有这些构造，能省掉整遍正则扫描
+        if "{#" in full_md or "├" in full_md or "└" in full_md:
+            full_md = _RE_HEADING_ATTR_OR_TREE.sub(_strip_attr_or_normalize_tree, full_md)
 
         # 将裸编号标题（如 2.1 xxx）提升为 Markdown 标题
         full_md = self._promote_plain_numbered_heading_lines(full_md, expected_headings=expected_headings)
 
+        # 针对各专项后处理的触发构造做哨兵预检（C 级子串查找，远快于逐行扫描）。
+        # 只对“前置环节不会凭空制造其输入”的环节做短路，表格转换会新生成
+        # 管道表/分隔线，其下游环节保持无条件执行。
+        has_pipe = "|" in full_md
+        has_grid = "+-" in full_md or "+=" in full_md or "+:" in full_md
+        has_curl = "curl" in full_md
+
+        # 以下按行处理的后处理链共享同一个行列表，整篇只拆分/拼接一次
+        lines = full_md.split("\n")
+
         # 按编号规则统一标题层级（例如 2.1.3 与 2.1.5 保持同级）
-        full_md = self._normalize_numbered_heading_levels(full_md)
+        lines = self._normalize_numbered_heading_levels_lines(lines)
 
         # 将“对象字段说明”子表并回主表，并用 └─ 展示层级
-        full_md = self._merge_hierarchical_field_tables(full_md)
+        if has_pipe:
+            lines = self._merge_hierarchical_field_tables_lines(lines)
 
-        # 处理少量残留的 pandoc 网格表行（并入上一张表）
-        full_md = self._flatten_residual_grid_table_rows(full_md)
+        if has_grid:
+            # 处理少量残留的 pandoc 网格表行（并入上一张表）
+            lines = self._flatten_residual_grid_table_rows_lines(lines)
 
-        # 将残留的 grid table 统一转为标准 Markdown 表格
-        full_md = self._convert_residual_grid_tables(full_md)
+            # 将残留的 grid table 统一转为标准 Markdown 表格
+            lines = self._convert_residual_grid_tables_lines(lines)
 
         # 将 pandoc simple table（---- ---- 形态）转为 Markdown 表格
-        full_md = self._convert_pandoc_simple_tables(full_md)
+        lines = self._convert_pandoc_simple_tables_lines(lines)
 
         # 将“名称 类型 必填 说明”这类纯文本伪表格转为 Markdown 表格
-        full_md = self._convert_plain_text_tabular_blocks(full_md)
+        lines = self._convert_plain_text_tabular_blocks_lines(lines)
         # 表格换行说明并回上一行，避免出现仅保留“说明列”的空行
-        full_md = self._merge_wrapped_description_rows_in_tables(full_md)
+        lines = self._merge_wrapped_description_rows_in_tables_lines(lines)
         # 将“名称|类型|必填”三列表扩展为四列表，并拆分必填列中挤压的说明文字
-        full_md = self._expand_required_only_tables_with_description(full_md)
+        lines = self._expand_required_only_tables_with_description_lines(lines)
 
         # 同一张表内根据缩进/前缀识别子层级，并统一为 └─
-        full_md = self._normalize_indented_hierarchy_in_tables(full_md)
+        lines = self._normalize_indented_hierarchy_in_tables_lines(lines)
 
         # 结合紧邻的 JSON 示例，修正参数表中的层级深度缩进
-        full_md = self._normalize_hierarchy_from_nearby_json_examples(full_md)
+        lines = self._normalize_hierarchy_from_nearby_json_examples_lines(lines)
         # 若缺少可用 JSON 示例，回退为基于对象行的层级推断
-        full_md = self._normalize_hierarchy_with_object_row_fallback(full_md)
+        lines = self._normalize_hierarchy_with_object_row_fallback_lines(lines)
 
         # 接口文档常见标签统一为加粗前缀（如 请求方式：/接口描述：）
-        full_md = self._normalize_api_label_lines(full_md)
+        lines = self._normalize_api_label_lines_lines(lines)
 
         # 补齐未包裹代码块的 curl 命令
-        full_md = self._wrap_curl_commands_in_code_blocks(full_md)
+        if has_curl:
+            lines = self._wrap_curl_commands_in_code_blocks_lines(lines)
+
+        full_md = "\n".join(lines)
 
-        # 尝试将可解析 JSON 代码块统一规范化并美化
-        full_md = self._normalize_json_fenced_blocks(full_md)
+        # 尝试将可解析 JSON 代码块统一规范化并美化（也覆盖无语言围栏）
+        if "```" in full_md:
+            full_md = self._normalize_json_fenced_blocks(full_md)
 
         # 相邻的加粗行之间加空行（避免渲染成一行）
-        full_md = re.sub(
-            r'^(\*\*[^*]+\*\*)\n(\*\*[^*]+\*\*)$',
-            r'\1\n\n\2',
-            full_md,
-            flags=re.MULTILINE,
-        )
+        if "**" in full_md:
+            full_md = _RE_ADJ_BOLD_LINES.sub(r'\1\n\n\2', full_md)
 
         # 生成目录
         if self.generate_toc:
@@ -631,20 +1282,16 @@ class Doc2MDAgent:
         return "未识别章节"
 
     def _normalize_heading_text(self, heading: str) -> str:
-        """标题比较归一化：忽略空白差异。"""
-        return re.sub(r'\s+', '', heading.strip())
+        return _normalize_heading_text(heading)
 
     def _extract_section_id(self, numbered_heading: str) -> str:
-        match = re.match(r'^(\d+(?:\.\d+)*)\s+', numbered_heading.strip())
-        return match.group(1) if match else ""
+        return _extract_section_id(numbered_heading)
 
     def _strip_heading_number_prefix(self, heading: str) -> str:
-        return re.sub(r'^\d+(?:\.\d+)*\s+', '', heading.strip())
+        return _strip_heading_number_prefix(heading)
 
     def _heading_level_from_section_id(self, section_id: str) -> int:
-        if not section_id:
-            return 2
-        return min(6, len(section_id.split(".")) + 1)
+        return _heading_level_from_section_id(section_id)
 
     def _heading_level_from_numbered_heading(self, numbered_heading: str) -> int:
         section_id = self._extract_section_id(numbered_heading)
@@ -655,15 +1302,19 @@ class Doc2MDAgent:
         从一行文本中提取“编号标题候选”。
         返回 `(标准化标题文本, 目标标题层级)`，如 `("2.1 接口格式", 3)`。
         """
+        # 编号标题必然以数字开头，绝大多数正文行在这里直接出局，
+        # 不必走属性剥离和表格分隔线判定
+        lead = line.lstrip()
+        if not lead or not lead[0].isdigit():
+            return None
+
         stripped = self._strip_heading_attrs(line.strip())
         if not stripped:
             return None
-        if stripped.startswith(("|", "-", "*", "+", ">", "[", "![", "```")):
-            return None
         if self._looks_like_table_delimiter_line(stripped):
             return None
 
-        match = re.match(r'^(\d+(?:\.\d+)*)\s*([、.．\)）])?\s+(.+)$', stripped)
+        match = _RE_NUMBERED_CANDIDATE.match(stripped)
         if not match:
             return None
 
@@ -700,14 +1351,10 @@ class Doc2MDAgent:
         stripped = line.strip()
         if not stripped:
             return False
-        if re.fullmatch(r'[+:=\-\| ]{5,}', stripped):
-            return True
-        if not (stripped.startswith("|") and stripped.endswith("|")):
-            return False
-        cells = [cell.strip() for cell in stripped.strip("|").split("|")]
-        if not cells:
+        # 分隔线首字符只可能是这几种，其余行免去正则判定
+        if stripped[0] not in "+:=-|":
             return False
-        return all(bool(re.fullmatch(r':?-{3,}:?', cell or '---')) for cell in cells)
+        return bool(_RE_TABLE_DELIM_LINE.fullmatch(stripped))
 
     def _promote_plain_numbered_heading_lines(
         self,
@@ -718,8 +1365,8 @@ class Doc2MDAgent:
         将未带 `#` 的编号标题行提升为 Markdown 标题。
         示例：`2.1 接口格式` -> `### 2.1 接口格式`
         """
-        lines = markdown.split("\n")
         promoted: list[str] = []
+        append = promoted.append
         in_code_block = False
         expected_norm_set = {
             self._normalize_heading_text(h)
@@ -727,57 +1374,47 @@ class Doc2MDAgent:
             if h and h.strip()
         }
 
-        for idx, line in enumerate(lines):
+        # 流式单遍扫描：只保留上一行/下一行的窗口，不整体物化行列表
+        prev_stripped = ""
+        iterator = _iter_lines(markdown)
+        line = next(iterator, None)
+        while line is not None:
+            next_line = next(iterator, None)
+            replacement = line
             stripped = line.strip()
             if stripped.startswith("```"):
                 in_code_block = not in_code_block
-                promoted.append(line)
-                continue
-
-            if in_code_block:
-                promoted.append(line)
-                continue
-
-            if re.match(r'^\s*#{1,6}\s+', line):
-                promoted.append(line)
-                continue
-
-            candidate = self._extract_numbered_heading_candidate(line)
-            if not candidate:
-                promoted.append(line)
-                continue
-
-            heading_text, level = candidate
-            if expected_norm_set and self._normalize_heading_text(heading_text) not in expected_norm_set:
-                promoted.append(line)
-                continue
-
-            prev_line = lines[idx - 1].strip() if idx > 0 else ""
-            next_line = lines[idx + 1].strip() if idx + 1 < len(lines) else ""
-            context_ok = (
-                not prev_line
-                or not next_line
-                or prev_line == "---"
-                or next_line.startswith("#")
-                or next_line.startswith("|")
-                or next_line.startswith("```")
-            )
-            if not context_ok:
-                promoted.append(line)
-                continue
-
-            promoted.append(f"{'#' * level} {heading_text}")
+            # startswith 先挡掉绝大多数非标题行，避免每行都进正则引擎
+            elif not in_code_block and not (stripped.startswith("#") and _RE_ANY_HEADING_PREFIX.match(line)):
+                candidate = self._extract_numbered_heading_candidate(line)
+                if candidate:
+                    heading_text, level = candidate
+                    if not expected_norm_set or _normalize_heading_text(heading_text) in expected_norm_set:
+                        next_stripped = next_line.strip() if next_line is not None else ""
+                        context_ok = (
+                            not prev_stripped
+                            or not next_stripped
+                            or prev_stripped == "---"
+                            or next_stripped.startswith(("#", "|", "```"))
+                        )
+                        if context_ok:
+                            replacement = f"{'#' * level} {heading_text}"
+            append(replacement)
+            prev_stripped = stripped
+            line = next_line
 
         return "\n".join(promoted)
 
     def _normalize_numbered_heading_levels(self, markdown: str) -> str:
+        return "\n".join(self._normalize_numbered_heading_levels_lines(markdown.split("\n")))
+
+    def _normalize_numbered_heading_levels_lines(self, lines: list[str]) -> list[str]:
         """
         统一编号标题层级：
         - 1 -> ##
         - 1.1 -> ###
         - 1.1.1 -> ####
         """
-        lines = markdown.split("\n")
         in_code_block = False
         normalized: list[str] = []
 
@@ -792,12 +1429,12 @@ class Doc2MDAgent:
                 normalized.append(line)
                 continue
 
-            match = re.match(r'^\s*#{1,6}\s+(.+)$', line)
-            if not match:
+            hashes = _leading_hashes(line)
+            if not hashes:
                 normalized.append(line)
                 continue
 
-            candidate = self._extract_numbered_heading_candidate(match.group(1))
+            candidate = self._extract_numbered_heading_candidate(stripped[hashes:])
             if not candidate:
                 normalized.append(line)
                 continue
@@ -805,25 +1442,20 @@ class Doc2MDAgent:
             title, level = candidate
             normalized.append(f"{'#' * level} {title}")
 
-        return "\n".join(normalized)
+        return normalized
 
     def _extract_expected_headings_from_toc(self, raw_md: str) -> list[str]:
         """从原始提取内容中的目录行提取编号标题序列。"""
-        headings = []
-        for line in raw_md.split("\n"):
-            stripped = line.strip()
-            if stripped.startswith("# "):
-                break
-            match = re.match(r'^\[(\d+(?:\.\d+)*\s+.+?)\s+\[\d+\]\(#', stripped)
-            if match:
-                headings.append(match.group(1).strip())
-        return headings
+        # 目录只出现在第一个真实标题之前：先定位首个 `# ` 行，再在前缀上扫描目录行
+        first_h1 = _RE_FIRST_H1_M.search(raw_md)
+        toc_region = raw_md[:first_h1.start()] if first_h1 else raw_md
+        return [heading.strip() for heading in _RE_TOC_LINE_M.findall(toc_region)]
 
     def _build_rule_based_structure(self, raw_md: str, expected_headings: list[str]) -> dict[str, Any]:
         """基于目录编号构建结构信息，避免 AI 自行猜测层级。"""
         title = ""
-        for line in raw_md.split("\n")[:30]:
-            m = re.match(r'^\*\*(.+?)\*\*$', line.strip())
+        for line in islice(_iter_lines(raw_md), 30):
+            m = _RE_BOLD_ONLY_LINE.match(line.strip())
             if m and "说明书" in m.group(1):
                 title = m.group(1).strip()
                 break
@@ -831,7 +1463,7 @@ class Doc2MDAgent:
         heading_mapping: dict[str, str] = {}
         sections = []
         for heading in expected_headings:
-            m = re.match(r'^(\d+(?:\.\d+)*)\s+(.+)$', heading)
+            m = _RE_NUMBERED_SPLIT.match(heading)
             if not m:
                 continue
             section_id = m.group(1)
@@ -851,36 +1483,27 @@ class Doc2MDAgent:
 
     def _split_raw_sections(self, content_body: str) -> list[dict[str, Any]]:
         """按原始一级标题（pandoc 提取后的 `#` 行）切分正文。"""
-        lines = content_body.split("\n")
-        sections: list[list[str]] = []
-        current: list[str] = []
-
-        for line in lines:
-            if re.match(r'^\s*#\s+', line):
-                if current:
-                    sections.append(current)
-                current = [line]
-            else:
-                if not current:
-                    current = [line]
-                else:
-                    current.append(line)
-
-        if current:
-            sections.append(current)
+        # 零宽 lookahead 切分：每个片段从一条 `#` 行开始，首段可能是无标题前言
+        parts = _RE_SECTION_SPLIT.split(content_body)
+        last = len(parts) - 1
 
         result = []
-        for section_lines in sections:
-            content = "\n".join(section_lines)
-            first_non_empty = next((ln for ln in section_lines if ln.strip()), "")
-            has_heading = bool(re.match(r'^\s*#\s+', first_non_empty))
+        for idx, part in enumerate(parts):
+            if idx == 0 and not part and last > 0:
+                # 正文直接以标题开头时，zero-width split 会产生空首段
+                continue
+            if idx < last and part.endswith("\n"):
+                # 去掉作为行分隔符归属于下一段标题行的换行
+                part = part[:-1]
+            first_non_empty = next((ln for ln in _iter_lines(part) if ln.strip()), "")
+            has_heading = _is_h1_line(first_non_empty)
             heading_text = ""
             if has_heading:
-                heading_text = re.sub(r'^\s*#\s+', '', first_non_empty).strip()
+                heading_text = first_non_empty.lstrip()[1:].strip()
                 heading_text = self._strip_heading_attrs(heading_text)
             result.append(
                 {
-                    "content": content,
+                    "content": part,
                     "has_heading": has_heading,
                     "heading_text": heading_text,
                 }
@@ -912,11 +1535,10 @@ class Doc2MDAgent:
                 prev_heading = expected_headings[heading_index - 1] if heading_index > 0 else ""
                 next_heading = expected_headings[heading_index] if heading_index < len(expected_headings) else ""
 
-            section_chunks = split_content(section["content"], self.chunk_size)
-            for idx, chunk in enumerate(section_chunks):
+            section_chunks = split_content_with_headings(section["content"], self.chunk_size)
+            for idx, (chunk, chunk_has_heading) in enumerate(section_chunks):
                 if not chunk.strip():
                     continue
-                chunk_has_heading = bool(re.search(r'^\s*#\s+', chunk, flags=re.MULTILINE))
                 jobs.append(
                     {
                         "content": chunk,
@@ -932,16 +1554,46 @@ class Doc2MDAgent:
 
         return jobs
 
-    def _extract_numbered_headings(self, markdown: str) -> list[str]:
+    def _scan_output_headings(self, text_no_code: str) -> tuple[bool, list[str], list[tuple[int, str]]]:
+        """
+        单遍扫描去代码文本中的标题行，返回
+        (是否存在标题行, 编号标题列表, 层级校验条目[(实际层级, 标题)])。
+        等价于分别按标题行/编号标题/编号层级三个模式各扫一遍，
+        分片校验热路径合并为一次行遍历。
+        """
+        has_heading_line = False
+        numbered_titles: list[str] = []
+        level_entries: list[tuple[int, str]] = []
+        for line in _iter_lines(text_no_code):
+            hashes = _leading_hashes(line)
+            if not hashes:
+                continue
+            has_heading_line = True
+            # tail 保留行尾空白：层级判定的原模式允许“编号+纯尾随空白”形态
+            tail = line.lstrip()[hashes:].lstrip()
+            rest = tail.rstrip()
+            if hashes >= 2 and line.startswith("#"):
+                title = self._strip_heading_attrs(rest)
+                if title != "目录" and _RE_LEADING_DIGIT.match(title):
+                    numbered_titles.append(title)
+            if _RE_NUMBERED_SPLIT.match(tail):
+                level_entries.append((hashes, self._strip_heading_attrs(rest)))
+        return has_heading_line, numbered_titles, level_entries
+
+    def _extract_numbered_headings(self, text_no_code: str) -> list[str]:
+        """提取编号标题。入参需已去除代码块，调用方可复用自己的去代码结果。"""
         headings = []
-        for line in self._remove_fenced_code_blocks(markdown).split("\n"):
-            match = re.match(r'^#{2,6}\s+(.+)$', line)
+        for line in _iter_lines(text_no_code):
+            # 编号标题必然以 ## 打头，C 层 startswith 先筛一遍
+            if not line.startswith("##"):
+                continue
+            match = _RE_NUMBERED_HEADING_BODY.match(line)
             if not match:
                 continue
             title = self._strip_heading_attrs(match.group(1).strip())
             if title == "目录":
                 continue
-            if re.match(r'^\d', title):
+            if _RE_LEADING_DIGIT.match(title):
                 headings.append(title)
         return headings
 
@@ -950,19 +1602,22 @@ class Doc2MDAgent:
         提取错误码（表格或普通文本行）。
         仅用于“错误码章节”对比，避免模型扩写大量不存在编码。
         """
-        codes = set(re.findall(r'^\s*\|?\s*(\d{4,6})\s*(?:\||\s{2,})', text, flags=re.MULTILINE))
+        codes = set(_RE_ERROR_CODE.findall(text))
         return {code for code in codes if code.isdigit()}
 
     def _extract_json_blocks(self, text: str) -> list[str]:
         """提取 ```json fenced code block 内容。"""
-        pattern = re.compile(r'```json\s*\n(.*?)\n```', re.S)
-        return [m.group(1).strip() for m in pattern.finditer(text)]
+        # 多数分片不含 JSON，子串判断比 DOTALL 正则扫全文便宜得多
+        if "```json" not in text:
+            return []
+        return [m.group(1).strip() for m in _RE_JSON_FENCE_BLOCK.finditer(text)]
 
     def _extract_fenced_code_blocks(self, text: str) -> list[dict[str, Any]]:
         """提取 fenced code block（含语言标记和内容）。"""
-        pattern = re.compile(r'```([^\n`]*)\s*\n(.*?)\n```', re.S)
+        if "```" not in text:
+            return []
         blocks: list[dict[str, Any]] = []
-        for match in pattern.finditer(text):
+        for match in _RE_FENCE_BLOCK_ANY.finditer(text):
             blocks.append(
                 {
                     "lang": (match.group(1) or "").strip().lower(),
@@ -979,6 +1634,8 @@ class Doc2MDAgent:
         - ```json
         - 无语言但内容以 { / [ 开头（用于 JSON 降级为普通代码块后的校验）
         """
+        if "```" not in text:
+            return []
         candidates = []
         for block in self._extract_fenced_code_blocks(text):
             content = str(block.get("content", "")).strip()
@@ -1016,137 +1673,171 @@ class Doc2MDAgent:
         return notice + self._fence_code_block(block_text.strip(), language="")
 
     def _strip_json_comments(self, text: str) -> str:
-        s = re.sub(r'/\*[\s\S]*?\*/', '', text)
-        s = re.sub(r'^\s*//.*$', '', s, flags=re.MULTILINE)
+        s = _RE_JSON_BLOCK_COMMENT.sub('', text)
+        s = _RE_JSON_LINE_COMMENT.sub('', s)
         return s
 
     def _quote_unquoted_json_keys(self, text: str) -> str:
-        s = re.sub(r'([{\[,]\s*)([A-Za-z_][A-Za-z0-9_.-]*)(\s*:)', r'\1"\2"\3', text)
-        s = re.sub(r'^(\s*)([A-Za-z_][A-Za-z0-9_.-]*)(\s*:)', r'\1"\2"\3', s, flags=re.MULTILINE)
-        return s
+        return _RE_UNQUOTED_KEY.sub(r'\1"\2"\3', text)
 
     def _replace_single_quoted_strings(self, text: str) -> str:
-        pattern = re.compile(r"'([^'\\]*(?:\\.[^'\\]*)*)'")
-        return pattern.sub(lambda m: '"' + m.group(1).replace('"', '\\"') + '"', text)
+        return _RE_SINGLE_QUOTED_STRING.sub(lambda m: '"' + m.group(1).replace('"', '\\"') + '"', text)
+
+    @staticmethod
+    def _missing_comma_repl(m: "re.Match[str]") -> str:
+        """值后紧跟的字符串确实是 key（闭合引号后为冒号）时才补逗号。"""
+        s = m.string
+        close = _find_string_end(s, m.end() + 1)
+        if close == -1:
+            return m.group(0)
+        j = close
+        total = len(s)
+        while j < total and s[j].isspace():
+            j += 1
+        if j < total and s[j] == ':':
+            return m.group(1) + ', '
+        return m.group(0)
 
     def _insert_missing_json_commas(self, text: str) -> str:
         s = text
-        s = re.sub(
-            r'("([^"\\]|\\.)*"|-?\d+(?:\.\d+)?(?:[eE][+-]?\d+)?|\btrue\b|\bfalse\b|\bnull\b|[}\]])\s*(?="([^"\\]|\\.)*"\s*:)',
-            r'\1, ',
-            s,
-        )
-        s = re.sub(r'(\})\s*(\{)', r'\1,\n\2', s)
-        s = re.sub(r'(\])\s*(\[)', r'\1,\n\2', s)
+        s = _RE_MISSING_COMMA_BEFORE_KEY.sub(self._missing_comma_repl, s)
+        s = _RE_ADJ_OBJECTS.sub(r'\1,\n\2', s)
+        s = _RE_ADJ_ARRAYS.sub(r'\1,\n\2', s)
         return s
 
     def _balance_json_brackets(self, text: str) -> tuple[str, bool]:
-        """补全缺失的括号/方括号，并删除多余闭合符。"""
-        open_to_close = {"{": "}", "[": "]"}
-        close_to_open = {"}": "{", "]": "["}
+        """补全缺失的括号/方括号，并删除多余闭合符。
+
+        不逐字符循环：按关键字符（引号/括号/反斜杠）跳跃扫描，
+        中间的普通文本整段切片复制，字符串体一次定位到闭合引号。
+        """
         stack: list[str] = []
-        result: list[str] = []
-        in_string = False
-        escaped = False
+        parts: list[str] = []
         changed = False
+        unterminated = False
+        n = len(text)
+        i = 0
+        append = parts.append
+        search = _RE_JSON_SPECIAL.search
 
-        for ch in text:
-            if in_string:
-                result.append(ch)
-                if escaped:
-                    escaped = False
-                elif ch == "\\":
-                    escaped = True
-                elif ch == '"':
-                    in_string = False
-                continue
-
+        while i < n:
+            match = search(text, i)
+            if not match:
+                append(text[i:])
+                i = n
+                break
+            j = match.start()
+            ch = text[j]
             if ch == '"':
-                in_string = True
-                result.append(ch)
+                end = _find_string_end(text, j + 1)
+                if end == -1:
+                    append(text[i:])
+                    unterminated = True
+                    i = n
+                    break
+                append(text[i:end])
+                i = end
                 continue
-            if ch in open_to_close:
-                stack.append(ch)
-                result.append(ch)
+            if ch == '\\':
+                # 字符串外的反斜杠不影响状态，原样保留
+                append(text[i:j + 1])
+                i = j + 1
                 continue
-            if ch in close_to_open:
-                if stack and stack[-1] == close_to_open[ch]:
-                    stack.pop()
-                    result.append(ch)
-                else:
-                    changed = True
+            if ch in _JSON_OPEN_TO_CLOSE:
+                stack.append(ch)
+                append(text[i:j + 1])
+                i = j + 1
                 continue
-            result.append(ch)
+            if stack and stack[-1] == _JSON_CLOSE_TO_OPEN[ch]:
+                stack.pop()
+                append(text[i:j + 1])
+            else:
+                # 多余闭合符：丢弃该字符
+                append(text[i:j])
+                changed = True
+            i = j + 1
 
-        if in_string:
-            result.append('"')
+        if unterminated:
+            append('"')
             changed = True
 
         while stack:
-            opener = stack.pop()
-            result.append(open_to_close[opener])
+            append(_JSON_OPEN_TO_CLOSE[stack.pop()])
             changed = True
 
-        return "".join(result), changed
+        return "".join(parts), changed
 
     def _strip_mailto_artifacts_in_json(self, text: str) -> str:
         """
         清理 docx/pandoc 造成的 mailto 污染：
         ["a@b.com"](mailto:a@b.com) -> "a@b.com"
         """
-        pattern = re.compile(r'\[\s*([^\]]+?)\s*[，,]?\s*\]\(\s*mailto:[^)]+\)', flags=re.IGNORECASE)
-
         def repl(match: re.Match[str]) -> str:
             value = match.group(1).strip()
             value = value.strip('"').strip("'").rstrip("，,")
             return f'"{value}"'
 
-        return pattern.sub(repl, text)
+        return _RE_MAILTO_LINK.sub(repl, text)
 
     def _remove_invalid_json_escapes(self, text: str) -> str:
         """
         去除 JSON 中非法转义（如 \\*、\\_），保留合法转义。
         """
-        return re.sub(r'\\([^"\\/bfnrtu])', r'\1', text)
+        return _RE_INVALID_JSON_ESCAPE.sub(r'\1', text)
 
     def _collapse_double_escaped_quotes_in_strings(self, text: str) -> str:
         """
         将字符串中的 `\\\"` 压缩为 `\"`，避免把引号错误地双重转义。
         仅在 JSON 字符串内处理，避免影响结构字符。
         """
-        result: list[str] = []
+        # 不含 \\" 序列时直接返回，多数 JSON 块在这里零成本短路
+        if '\\\\"' not in text:
+            return text
+
+        parts: list[str] = []
+        append = parts.append
         in_string = False
         escaped = False
+        n = len(text)
         i = 0
 
-        while i < len(text):
-            ch = text[i]
-
+        while i < n:
             if not in_string:
-                result.append(ch)
-                if ch == '"':
-                    in_string = True
-                    escaped = False
-                i += 1
+                j = text.find('"', i)
+                if j == -1:
+                    append(text[i:])
+                    break
+                append(text[i:j + 1])
+                in_string = True
+                escaped = False
+                i = j + 1
                 continue
 
-            if ch == '\\' and i + 2 < len(text) and text[i + 1] == '\\' and text[i + 2] == '"':
-                result.append('\\')
-                result.append('"')
-                i += 3
+            match = _RE_STRING_SPECIAL.search(text, i)
+            if not match:
+                append(text[i:])
+                break
+            j = match.start()
+            if j > i:
+                # 跳过的普通字符会清掉转义标志
+                append(text[i:j])
+                escaped = False
+            ch = text[j]
+            if ch == '\\' and j + 2 < n and text[j + 1] == '\\' and text[j + 2] == '"':
+                append('\\"')
+                i = j + 3
                 escaped = False
                 continue
-
-            result.append(ch)
+            append(ch)
             if escaped:
                 escaped = False
             elif ch == '\\':
                 escaped = True
             elif ch == '"':
                 in_string = False
-            i += 1
+            i = j + 1
 
-        return "".join(result)
+        return "".join(parts)
 
     def _sanitize_json_like_text(self, text: str) -> str:
         """
@@ -1155,21 +1846,12 @@ class Doc2MDAgent:
         - 去掉尾随逗号
         - 将带字母的裸值（如 1118xxxx5311）转为字符串
         """
-        s = text.replace("\u00a0", " ").replace("\ufeff", "").strip()
-        s = (
-            s.replace("“", '"')
-            .replace("”", '"')
-            .replace("‘", "'")
-            .replace("’", "'")
-            .replace("：", ":")
-            .replace("，", ",")
-        )
+        s = text.translate(_JSON_SANITIZE_TABLE).strip()
         s = self._strip_mailto_artifacts_in_json(s)
-        s = s.replace('\\[', '[')
-        s = s.replace('\\]', ']')
+        s = _RE_ESCAPED_BRACKET.sub(r'\1', s)
         s = self._collapse_double_escaped_quotes_in_strings(s)
         s = self._remove_invalid_json_escapes(s)
-        s = re.sub(r',\s*([}\]])', r'\1', s)
+        s = _RE_TRAILING_COMMA.sub(r'\1', s)
 
         def quote_masked_literals(m):
             prefix = m.group(1)
@@ -1178,60 +1860,201 @@ class Doc2MDAgent:
             lower = value.lower()
             if lower in {"true", "false", "null"}:
                 return m.group(0)
-            if re.fullmatch(r'-?\d+(?:\.\d+)?', value):
+            if _RE_NUMBER_LITERAL.fullmatch(value):
                 return m.group(0)
             return f'{prefix}"{value}"{suffix}'
 
-        s = re.sub(
-            r'(:\s*)([A-Za-z0-9_./:+-]*[A-Za-z][A-Za-z0-9_./:+-]*)(\s*[,}\]])',
-            quote_masked_literals,
-            s,
-        )
-        s = re.sub(
-            r'(:\s*)([A-Za-z0-9_./:+-]*[A-Za-z][A-Za-z0-9_./:+-]*)(\s*)(?=\n\s*["\']?[A-Za-z_][A-Za-z0-9_.-]*["\']?\s*:)',
-            quote_masked_literals,
-            s,
-        )
+        s = _RE_MASKED_LITERAL.sub(quote_masked_literals, s)
+        s = _RE_MASKED_LITERAL_EOL.sub(quote_masked_literals, s)
         return s
 
     def _smart_fill_json_like_text(self, text: str) -> tuple[str, list[str]]:
-        """尝试自动补全常见 JSON 语法缺陷。"""
-        s = text
-        actions: list[str] = []
+        """尝试自动补全常见 JSON 语法缺陷（单遍扫描，字符串内容不会被改写）。"""
+        return self._json_repair_pass(text)
 
-        no_comments = self._strip_json_comments(s)
-        if no_comments != s:
-            actions.append("移除注释")
-            s = no_comments
+    def _json_repair_pass(self, text: str) -> tuple[str, list[str]]:
+        """
+        单遍 token 化修复：原先六个独立的全文正则扫描
+        （去注释/补 key 引号/单引号转双引号/补逗号/去尾随逗号/配平括号）
+        合并为一次遍历，字符串字面量整段跳过，注释和逗号修复不会再误伤
+        字符串内部的 `}{`、`//` 等内容。
+        """
+        out: list[str] = []
+        append = out.append
+        stack: list[str] = []
+        n = len(text)
+        i = 0
+        prev = ''        # 上一个有效 token 类别：'' / 'value' / 'open' / 'comma' / 'colon'
+        prev_close = ''  # 上一个值 token 若是闭合括号，记录其字符
+        line_start = True
+        fixed_comments = fixed_keys = fixed_single = fixed_commas = fixed_brackets = False
 
-        quoted_keys = self._quote_unquoted_json_keys(s)
-        if quoted_keys != s:
-            actions.append("补全未加引号的 key")
-            s = quoted_keys
+        def next_nonspace(k: int) -> int:
+            while k < n and (text[k] in _JSON_WS or text[k] == '\n'):
+                k += 1
+            return k
 
-        single_quoted = self._replace_single_quoted_strings(s)
-        if single_quoted != s:
-            actions.append("将单引号字符串改为双引号")
-            s = single_quoted
+        while i < n:
+            ch = text[i]
+            if ch in _JSON_WS:
+                append(ch)
+                i += 1
+                continue
+            if ch == '\n':
+                append(ch)
+                line_start = True
+                i += 1
+                continue
 
-        with_commas = self._insert_missing_json_commas(s)
-        if with_commas != s:
-            actions.append("补全疑似缺失的逗号")
-            s = with_commas
+            if ch == '/' and i + 1 < n and text[i + 1] == '*':
+                end = text.find('*/', i + 2)
+                i = n if end == -1 else end + 2
+                fixed_comments = True
+                continue
+            if ch == '/' and i + 1 < n and text[i + 1] == '/' and line_start:
+                end = text.find('\n', i)
+                i = n if end == -1 else end
+                fixed_comments = True
+                continue
 
-        s = re.sub(r',\s*([}\]])', r'\1', s)
+            line_start = False
 
-        balanced, changed = self._balance_json_brackets(s)
-        if changed:
-            actions.append("补全括号/方括号")
-            s = balanced
+            if ch == '"':
+                end = _find_string_end(text, i + 1)
+                if end == -1:
+                    # 未闭合字符串：保留剩余内容并补一个收尾引号
+                    append(text[i:])
+                    append('"')
+                    fixed_brackets = True
+                    i = n
+                    break
+                if prev == 'value':
+                    k = next_nonspace(end)
+                    if k < n and text[k] == ':':
+                        append(', ')
+                        fixed_commas = True
+                append(text[i:end])
+                i = end
+                prev, prev_close = 'value', ''
+                continue
 
-        return s.strip(), actions
+            if ch == "'":
+                end = _find_string_end(text, i + 1, "'")
+                if end != -1:
+                    if prev == 'value':
+                        k = next_nonspace(end)
+                        if k < n and text[k] == ':':
+                            append(', ')
+                            fixed_commas = True
+                    body = text[i + 1:end - 1].replace('"', '\\"')
+                    append(f'"{body}"')
+                    fixed_single = True
+                    i = end
+                else:
+                    append(ch)
+                    i += 1
+                prev, prev_close = 'value', ''
+                continue
+
+            if ch in '{[':
+                if prev == 'value' and prev_close == _JSON_OPEN_TO_CLOSE[ch]:
+                    # 相邻对象/数组（}{ 或 ][）之间补逗号
+                    append(',\n')
+                    fixed_commas = True
+                stack.append(ch)
+                append(ch)
+                i += 1
+                prev, prev_close = 'open', ''
+                continue
+
+            if ch in '}]':
+                if stack and stack[-1] == _JSON_CLOSE_TO_OPEN[ch]:
+                    stack.pop()
+                    append(ch)
+                    prev, prev_close = 'value', ch
+                else:
+                    # 多余闭合符：丢弃
+                    fixed_brackets = True
+                i += 1
+                continue
+
+            if ch == ',':
+                k = next_nonspace(i + 1)
+                if k < n and text[k] in '}]':
+                    # 尾随逗号：丢弃
+                    i += 1
+                    continue
+                append(ch)
+                i += 1
+                prev, prev_close = 'comma', ''
+                continue
+
+            if ch == ':':
+                append(ch)
+                i += 1
+                prev, prev_close = 'colon', ''
+                continue
+
+            if ch in _JSON_IDENT_START:
+                j = i + 1
+                while j < n and text[j] in _JSON_IDENT_CHARS:
+                    j += 1
+                word = text[i:j]
+                k = next_nonspace(j)
+                if k < n and text[k] == ':':
+                    # 裸 key：补引号，必要时先补逗号
+                    if prev == 'value':
+                        append(', ')
+                        fixed_commas = True
+                    append(f'"{word}"')
+                    fixed_keys = True
+                else:
+                    append(word)
+                i = j
+                prev, prev_close = 'value', ''
+                continue
+
+            append(ch)
+            i += 1
+            prev, prev_close = 'value', ''
+
+        while stack:
+            append(_JSON_OPEN_TO_CLOSE[stack.pop()])
+            fixed_brackets = True
+
+        actions: list[str] = []
+        if fixed_comments:
+            actions.append("移除注释")
+        if fixed_keys:
+            actions.append("补全未加引号的 key")
+        if fixed_single:
+            actions.append("将单引号字符串改为双引号")
+        if fixed_commas:
+            actions.append("补全疑似缺失的逗号")
+        if fixed_brackets:
+            actions.append("补全括号/方括号")
+        return "".join(out).strip(), actions
 
     def _normalize_json_block_with_diagnostics(self, block_text: str) -> dict[str, Any]:
         raw = block_text.strip()
+
+        # 常见情况是模型输出本身就是合法 JSON：先直接解析，避免无谓的清洗/补全扫描
+        try:
+            parsed = _json_loads(raw)
+            return {
+                "ok": True,
+                "normalized": _json_dumps_pretty(parsed),
+                "parsed": parsed,
+                "strategy": "raw",
+                "actions": [],
+                "is_repaired": False,
+                "error": "",
+            }
+        except Exception as exc:
+            last_error = self._json_error_text(exc)
+
         candidates: list[tuple[str, str, list[str]]] = []
-        seen = set()
+        seen = {("raw", raw)}
 
         def add_candidate(stage: str, candidate: str, actions: list[str]) -> None:
             normalized_candidate = candidate.strip()
@@ -1241,19 +2064,17 @@ class Doc2MDAgent:
             seen.add(key)
             candidates.append((stage, normalized_candidate, actions))
 
-        add_candidate("raw", raw, [])
         sanitized = self._sanitize_json_like_text(raw)
         add_candidate("sanitize", sanitized, ["基础清洗"])
         smart_filled, smart_actions = self._smart_fill_json_like_text(sanitized)
         add_candidate("smart_fill", smart_filled, smart_actions)
-
-        last_error = "未知错误"
         for stage, candidate, actions in candidates:
             try:
-                parsed = json.loads(candidate)
+                parsed = _json_loads(candidate)
                 return {
                     "ok": True,
-                    "normalized": json.dumps(parsed, ensure_ascii=False, indent=2),
+                    "normalized": _json_dumps_pretty(parsed),
+                    "parsed": parsed,
                     "strategy": stage,
                     "actions": actions,
                     "is_repaired": stage != "raw",
@@ -1265,6 +2086,7 @@ class Doc2MDAgent:
         return {
             "ok": False,
             "normalized": raw,
+            "parsed": None,
             "strategy": "fallback",
             "actions": smart_actions,
             "is_repaired": False,
@@ -1307,14 +2129,19 @@ class Doc2MDAgent:
                 report["fallback_reasons"].append(f"source#{idx}: {reason}")
                 rendered_sources.append(self._build_json_fallback_block(block, reason, source="原文"))
 
-        pattern = re.compile(r'```json\s*\n(.*?)\n```', re.S)
-        matches = list(pattern.finditer(converted_chunk))
+        matches = list(_RE_JSON_FENCE_BLOCK.finditer(converted_chunk))
         if not matches:
             appended = "\n\n".join(rendered_sources)
             if not converted_chunk.strip():
                 return appended, report
             return converted_chunk.rstrip() + "\n\n" + appended, report
 
+        # 输出与回填结果逐块一致时无需重建字符串
+        if len(matches) == len(rendered_sources) and all(
+            match.group(0) == rendered for match, rendered in zip(matches, rendered_sources)
+        ):
+            return converted_chunk, report
+
         replace_count = min(len(matches), len(rendered_sources))
         parts: list[str] = []
         last_end = 0
@@ -1341,47 +2168,72 @@ class Doc2MDAgent:
         - 能解析则格式化
         - 仍无法解析则降级为普通代码块并提示
         """
-        pattern = re.compile(r'```json\s*\n(.*?)\n```', re.S)
-        matches = list(pattern.finditer(converted_chunk))
+        if "```json" not in converted_chunk:
+            return converted_chunk, {
+                "output_json_blocks": 0,
+                "output_json_repaired": 0,
+                "output_json_fallback": 0,
+                "fallback_reasons": [],
+            }
+
         report = {
-            "output_json_blocks": len(matches),
+            "output_json_blocks": 0,
             "output_json_repaired": 0,
             "output_json_fallback": 0,
             "fallback_reasons": [],
         }
-        if not matches:
-            return converted_chunk, report
 
+        # 流式遍历匹配，不先物化 match 列表；所有块都已规范时直接原样返回
         parts: list[str] = []
         last_end = 0
-        for idx, match in enumerate(matches, start=1):
+        changed = False
+        for match in _RE_JSON_FENCE_BLOCK.finditer(converted_chunk):
+            report["output_json_blocks"] += 1
             parts.append(converted_chunk[last_end:match.start()])
             diagnostic = self._normalize_json_block_with_diagnostics(match.group(1))
             if diagnostic["ok"]:
                 if diagnostic["is_repaired"]:
                     report["output_json_repaired"] += 1
-                parts.append(self._fence_code_block(diagnostic["normalized"], language="json"))
+                rendered = self._fence_code_block(diagnostic["normalized"], language="json")
             else:
                 reason = diagnostic["error"] or "无法解析"
                 report["output_json_fallback"] += 1
-                report["fallback_reasons"].append(f"output#{idx}: {reason}")
-                parts.append(self._build_json_fallback_block(match.group(1), reason, source="模型输出"))
+                report["fallback_reasons"].append(f"output#{report['output_json_blocks']}: {reason}")
+                rendered = self._build_json_fallback_block(match.group(1), reason, source="模型输出")
+            if rendered != match.group(0):
+                changed = True
+            parts.append(rendered)
             last_end = match.end()
 
+        if not report["output_json_blocks"] or not changed:
+            return converted_chunk, report
+
         parts.append(converted_chunk[last_end:])
         return "".join(parts), report
 
     def _remove_fenced_code_blocks(self, text: str) -> str:
         """移除 fenced code block，避免把代码内的 # 误判为标题。"""
-        cleaned = []
-        in_code_block = False
-        for line in text.split("\n"):
-            if line.strip().startswith("```"):
-                in_code_block = not in_code_block
-                continue
-            if not in_code_block:
-                cleaned.append(line)
-        return "\n".join(cleaned)
+        # 用正则定位 fence 行后按片段切片拼接，代替逐行 Python 循环；
+        # 未闭合的 fence 与原逐行实现一致：其后内容全部丢弃
+        parts: list[str] = []
+        last_end = 0
+        open_fence = None
+        for match in _RE_FENCE_LINE_M.finditer(text):
+            if open_fence is None:
+                parts.append(text[last_end:match.start()])
+                open_fence = match
+            else:
+                last_end = match.end()
+                open_fence = None
+        removed_to_eof = open_fence is not None
+        if open_fence is None:
+            parts.append(text[last_end:])
+            removed_to_eof = last_end == len(text) and not text.endswith("\n") and last_end > 0
+        cleaned = "".join(parts)
+        # fence 区域收尾于文本末尾时，逐行实现不会留下悬挂换行
+        if removed_to_eof and cleaned.endswith("\n"):
+            cleaned = cleaned[:-1]
+        return cleaned
 
     def _strip_heading_lines_outside_code_blocks(self, text: str) -> tuple[str, list[str]]:
         """
@@ -1399,14 +2251,14 @@ class Doc2MDAgent:
                 sanitized_lines.append(line)
                 continue
 
-            if not in_code_block and re.match(r'^\s*#{1,6}\s+.+$', line):
+            if not in_code_block and _leading_hashes(line):
                 removed_headings.append(stripped)
                 continue
 
             sanitized_lines.append(line)
 
         sanitized = "\n".join(sanitized_lines)
-        sanitized = re.sub(r'\n{3,}', '\n\n', sanitized).strip()
+        sanitized = _RE_BLANK_RUN3.sub('\n\n', sanitized).strip()
         return sanitized, removed_headings
 
     def _ensure_allowed_heading_in_chunk(
@@ -1433,38 +2285,43 @@ class Doc2MDAgent:
         target_level = self._heading_level_from_numbered_heading(target_heading)
         target_line = f"{'#' * target_level} {target_heading}"
 
-        lines = converted_chunk.split("\n")
+        # 用偏移量扫描代替 split + join：最多只改一行，
+        # 命中时按行的区间拼接，未改动时原样返回，避免整片重建
         in_code_block = False
-        heading_indices: list[int] = []
-
-        for idx, line in enumerate(lines):
+        first_heading_span: Optional[tuple[int, int]] = None
+        pos = 0
+        total = len(converted_chunk)
+
+        while pos <= total:
+            newline_at = converted_chunk.find("\n", pos)
+            end = newline_at if newline_at != -1 else total
+            line = converted_chunk[pos:end]
             stripped = line.strip()
+
             if stripped.startswith("```"):
                 in_code_block = not in_code_block
-                continue
-            if in_code_block:
-                continue
-
-            heading_match = re.match(r'^\s*#{1,6}\s+(.+)$', line)
-            if not heading_match:
-                continue
-
-            heading_indices.append(idx)
-            title = self._strip_heading_attrs(heading_match.group(1).strip())
-            title_norm = self._normalize_heading_text(title)
-            title_plain_norm = self._normalize_heading_text(self._strip_heading_number_prefix(title))
-
-            if title_norm == target_norm or title_plain_norm == target_plain_norm:
-                if line.strip() != target_line:
-                    lines[idx] = target_line
-                    return "\n".join(lines), True
-                return converted_chunk, False
+            elif not in_code_block:
+                hashes = _leading_hashes(line)
+                if hashes:
+                    if first_heading_span is None:
+                        first_heading_span = (pos, end)
+                    title = self._strip_heading_attrs(stripped[hashes:].strip())
+                    title_norm = self._normalize_heading_text(title)
+                    title_plain_norm = self._normalize_heading_text(self._strip_heading_number_prefix(title))
+
+                    if title_norm == target_norm or title_plain_norm == target_plain_norm:
+                        if stripped != target_line:
+                            return converted_chunk[:pos] + target_line + converted_chunk[end:], True
+                        return converted_chunk, False
+
+            if newline_at == -1:
+                break
+            pos = newline_at + 1
 
-        if heading_indices:
-            first_idx = heading_indices[0]
-            if lines[first_idx].strip() != target_line:
-                lines[first_idx] = target_line
-                return "\n".join(lines), True
+        if first_heading_span is not None:
+            start, end = first_heading_span
+            if converted_chunk[start:end].strip() != target_line:
+                return converted_chunk[:start] + target_line + converted_chunk[end:], True
             return converted_chunk, False
 
         if chunk_has_heading:
@@ -1481,29 +2338,45 @@ class Doc2MDAgent:
         if not s:
             return ""
 
-        s = re.sub(r'^\s*#{1,6}\s+', '', s)
-        s = re.sub(r'^\s*[-*+]\s+', '', s)
-        s = re.sub(r'^\s*\d+\.\s+', '', s)
-        s = re.sub(r'\{#[^}]*\}', '', s)
-        s = s.replace("```json", "```").replace("```bash", "```")
-        s = re.sub(r'!\[([^\]]*)\]\(([^)]+)\)', r'\1 \2', s)
-        s = re.sub(r'\[([^\]]+)\]\(([^)]+)\)', r'\1', s)
-        s = s.replace("|", " ")
-        s = re.sub(r'[`*_~]', '', s)
-        s = re.sub(r'\s+', ' ', s).strip()
+        # 行首前缀仍按 标题 → 列表 → 有序列表 的顺序各剥一层
+        m = _RE_HEADING_PREFIX.match(s)
+        if m:
+            s = s[m.end():]
+        m = _RE_GUARD_BULLET_PREFIX.match(s)
+        if m:
+            s = s[m.end():]
+        m = _RE_GUARD_ORDERED_PREFIX.match(s)
+        if m:
+            s = s[m.end():]
+        # 锚点和图片先单独替换（二者的产物会参与后续规则匹配），其余规则一次扫描
+        if "{#" in s:
+            s = _RE_ANCHOR_ATTR_ANY.sub('', s)
+        if "![" in s:
+            s = _RE_GUARD_IMAGE.sub(r'\1 \2', s)
+        s = _RE_GUARD_NORMALIZE.sub(_guard_normalize_repl, s)
+        s = _RE_WHITESPACE.sub(' ', s).strip()
         return s
 
+    def _normalize_guard_lines(self, text: str) -> list[str]:
+        """逐行归一化，返回非空的归一化行。"""
+        lines = []
+        for line in text.split("\n"):
+            normalized = self._normalize_text_for_content_guard(line)
+            if normalized:
+                lines.append(normalized)
+        return lines
+
+    def _tokens_from_guard_lines(self, normalized_lines: list[str]) -> list[str]:
+        """从归一化行提取小写 token（表格分隔线不参与）。
+        token 字符集不含换行，拼接后一次 findall 与逐行扫描结果一致。"""
+        joined = "\n".join(
+            line for line in normalized_lines
+            if not self._looks_like_table_delimiter_line(line)
+        )
+        return [token.lower() for token in _RE_GUARD_TOKEN.findall(joined)]
+
     def _extract_content_tokens_for_guard(self, text: str) -> list[str]:
-        tokens: list[str] = []
-        for line in text.split("\n"):
-            normalized = self._normalize_text_for_content_guard(line)
-            if not normalized:
-                continue
-            if self._looks_like_table_delimiter_line(normalized):
-                continue
-            for token in re.findall(r'[\u4e00-\u9fff]{2,}|[A-Za-z][A-Za-z0-9_.:/+\-]{1,}|[0-9]{2,}', normalized):
-                tokens.append(token.lower())
-        return tokens
+        return self._tokens_from_guard_lines(self._normalize_guard_lines(text))
 
     def _check_content_preservation(self, source_chunk: str, converted_chunk: str) -> tuple[bool, str]:
         """
@@ -1511,29 +2384,23 @@ class Doc2MDAgent:
         - token 覆盖率过低：判定为删减风险
         - 归一化字符长度比例过低：判定为删减风险
         """
-        source_tokens = self._extract_content_tokens_for_guard(source_chunk)
+        # 归一化每个分片只做一次，token 与字符比对共享同一份结果
+        source_lines = self._normalize_guard_lines(source_chunk)
+        source_tokens = self._tokens_from_guard_lines(source_lines)
         if not source_tokens:
             return True, ""
 
-        output_tokens = set(self._extract_content_tokens_for_guard(converted_chunk))
-        unique_source_tokens = list(dict.fromkeys(source_tokens))
-        matched_count = sum(1 for token in unique_source_tokens if token in output_tokens)
-        token_coverage = matched_count / max(1, len(unique_source_tokens))
-
-        source_plain = " ".join(
-            normalized
-            for normalized in (self._normalize_text_for_content_guard(line) for line in source_chunk.split("\n"))
-            if normalized
-        )
-        output_plain = " ".join(
-            normalized
-            for normalized in (self._normalize_text_for_content_guard(line) for line in converted_chunk.split("\n"))
-            if normalized
-        )
-        char_ratio = len(output_plain) / max(1, len(source_plain))
-
-        if len(unique_source_tokens) >= self.content_guard_min_tokens and token_coverage < self.min_content_token_coverage:
-            missing = [token for token in unique_source_tokens if token not in output_tokens][:6]
+        output_lines = self._normalize_guard_lines(converted_chunk)
+        output_tokens = set(self._tokens_from_guard_lines(output_lines))
+        source_token_set = set(source_tokens)
+        matched_count = len(source_token_set & output_tokens)
+        token_coverage = matched_count / max(1, len(source_token_set))
+
+        if len(source_token_set) >= self.content_guard_min_tokens and token_coverage < self.min_content_token_coverage:
+            # 只在报错时才构建有序的缺失样例，且最多取 6 个就停
+            missing = list(islice(
+                (token for token in dict.fromkeys(source_tokens) if token not in output_tokens), 6
+            ))
             return (
                 False,
                 (
@@ -1543,6 +2410,11 @@ class Doc2MDAgent:
                 ),
             )
 
+        # 覆盖率已通过时才需要算字符比例
+        source_plain = " ".join(source_lines)
+        output_plain = " ".join(output_lines)
+        char_ratio = len(output_plain) / max(1, len(source_plain))
+
         if len(source_plain) >= 120 and char_ratio < self.min_content_char_ratio:
             return (
                 False,
@@ -1561,6 +2433,8 @@ class Doc2MDAgent:
         allowed_headings: list[str],
         continuation_mode: bool,
         llm_meta: dict[str, Any],
+        source_json_blocks: Optional[list[str]] = None,
+        source_error_codes: Optional[set[str]] = None,
     ) -> tuple[bool, str]:
         if llm_meta.get("truncated"):
             return False, f"模型输出被截断（finish_reason={llm_meta.get('finish_reason')}）"
@@ -1570,12 +2444,11 @@ class Doc2MDAgent:
             return False, "模型返回空内容"
 
         output_no_code = self._remove_fenced_code_blocks(output)
-        heading_lines = re.findall(r'^\s*#{1,6}\s+.+$', output_no_code, flags=re.MULTILINE)
-        if continuation_mode and heading_lines:
+        has_heading_line, output_numbered, level_entries = self._scan_output_headings(output_no_code)
+        if continuation_mode and has_heading_line:
             return False, "续片输出包含标题行（continuation_mode=true）"
 
-        allowed_norm = {self._normalize_heading_text(h) for h in allowed_headings if h}
-        output_numbered = self._extract_numbered_headings(output)
+        allowed_norm = _normalize_heading_set(tuple(allowed_headings))
         output_numbered_norm = [self._normalize_heading_text(h) for h in output_numbered]
 
         if output_numbered_norm:
@@ -1589,12 +2462,7 @@ class Doc2MDAgent:
             if len(output_numbered_norm) > len(allowed_norm):
                 return False, "输出标题数量超过允许范围"
 
-            for line in output_no_code.split("\n"):
-                heading_match = re.match(r'^\s*(#{1,6})\s+(\d+(?:\.\d+)*\s+.+)$', line)
-                if not heading_match:
-                    continue
-                level = len(heading_match.group(1))
-                heading_text = self._strip_heading_attrs(heading_match.group(2).strip())
+            for level, heading_text in level_entries:
                 expected_level = self._heading_level_from_numbered_heading(heading_text)
                 if level != expected_level:
                     return False, (
@@ -1604,25 +2472,32 @@ class Doc2MDAgent:
         if not continuation_mode and allowed_norm and not output_numbered_norm:
             return False, "缺少必须的编号标题"
 
-        source_json_blocks = self._extract_json_blocks(source_chunk)
-        output_json_blocks = self._extract_json_blocks(output)
-        if not source_json_blocks and output_json_blocks:
-            return False, "源片段不含 JSON 代码块，禁止新增 JSON 代码块"
-        if source_json_blocks:
-            output_json_candidates = self._extract_json_candidate_code_blocks(output)
-            if len(output_json_candidates) < len(source_json_blocks):
-                return False, (
-                    "JSON 代码块数量不一致（source="
-                    f"{len(source_json_blocks)}, output_candidates={len(output_json_candidates)}）"
-                )
-        for idx, block in enumerate(output_json_blocks, start=1):
-            _, ok = self._normalize_json_block(block)
-            if not ok:
-                return False, f"第 {idx} 个 JSON 代码块不是合法 JSON"
+        # 双方都没有代码围栏时整段跳过 JSON 校验（纯文本分片的常见路径）
+        if "```" in source_chunk or "```" in output:
+            # 重试路径会预先提取一次源分片的 JSON 块，避免每次尝试重复扫描
+            if source_json_blocks is None:
+                source_json_blocks = self._extract_json_blocks(source_chunk)
+            output_json_blocks = self._extract_json_blocks(output)
+            if not source_json_blocks and output_json_blocks:
+                return False, "源片段不含 JSON 代码块，禁止新增 JSON 代码块"
+            if source_json_blocks:
+                output_json_candidates = self._extract_json_candidate_code_blocks(output)
+                if len(output_json_candidates) < len(source_json_blocks):
+                    return False, (
+                        "JSON 代码块数量不一致（source="
+                        f"{len(source_json_blocks)}, output_candidates={len(output_json_candidates)}）"
+                    )
+            for idx, block in enumerate(output_json_blocks, start=1):
+                _, ok = self._normalize_json_block(block)
+                if not ok:
+                    return False, f"第 {idx} 个 JSON 代码块不是合法 JSON"
 
         # “错误码”片段增加子集校验，防止 100000+ 幻觉扩写
         if "错误码" in source_chunk:
-            source_codes = self._extract_error_codes(source_chunk)
+            source_codes = (
+                source_error_codes if source_error_codes is not None
+                else self._extract_error_codes(source_chunk)
+            )
             output_codes = self._extract_error_codes(output)
             if source_codes and output_codes and not output_codes.issubset(source_codes):
                 extras = sorted(output_codes - source_codes)[:5]
@@ -1634,6 +2509,132 @@ class Doc2MDAgent:
 
         return True, ""
 
+    def _postvalidate_chunk_output(
+        self,
+        chunk: str,
+        converted: str,
+        llm_meta: dict[str, Any],
+        attempt_no: int,
+        chunk_index: int,
+        total_chunks: int,
+        section_id: str,
+        section_heading: str,
+        section_label: str,
+        allowed_headings: list[str],
+        continuation_mode: bool,
+        chunk_has_heading: bool,
+        source_json_blocks: Optional[list[str]] = None,
+        source_error_codes: Optional[set[str]] = None,
+    ) -> tuple[str, dict[str, Any], bool, str]:
+        """对单个分片输出做统一后处理 + 校验（供重试路径与批量路径共用）。"""
+        # 两个模式各自只会命中一次（^ / $ 锚定），直接按匹配区间切片
+        fence_open = _RE_MD_FENCE_OPEN_WS.match(converted)
+        if fence_open:
+            converted = converted[fence_open.end():]
+            fence_tail = _RE_FENCE_TAIL.search(converted)
+            if fence_tail:
+                converted = converted[:fence_tail.start()]
+
+        converted, source_json_report = self._replace_output_json_blocks_with_source_and_report(chunk, converted)
+        converted, output_json_report = self._sanitize_output_json_blocks_with_report(converted)
+
+        fallback_reasons = source_json_report.get("fallback_reasons", []) + output_json_report.get("fallback_reasons", [])
+        merged_meta = {
+            "attempts_used": attempt_no,
+            "source_json_blocks": source_json_report.get("source_json_blocks", 0),
+            "repaired_json_blocks": (
+                source_json_report.get("repaired_json_blocks", 0)
+                + output_json_report.get("output_json_repaired", 0)
+            ),
+            "fallback_json_blocks": (
+                source_json_report.get("fallback_json_blocks", 0)
+                + output_json_report.get("output_json_fallback", 0)
+            ),
+            "fallback_reasons": fallback_reasons,
+        }
+
+        if continuation_mode:
+            converted, removed_headings = self._strip_heading_lines_outside_code_blocks(converted)
+            if removed_headings:
+                merged_meta["removed_heading_lines"] = len(removed_headings)
+                self._emit_logic_event(
+                    (
+                        f"分片 {chunk_index}/{total_chunks} 自动修复：续片移除了 {len(removed_headings)} 行标题"
+                    ),
+                    event_type="continuation_heading_stripped",
+                    chunk_index=chunk_index,
+                    total_chunks=total_chunks,
+                    attempt=attempt_no,
+                    section_id=section_id,
+                    section_heading=section_heading or None,
+                    section_label=section_label,
+                    removed_heading_lines=len(removed_headings),
+                    removed_headings=removed_headings[:3],
+                )
+
+        converted, heading_fixed = self._ensure_allowed_heading_in_chunk(
+            converted_chunk=converted,
+            allowed_headings=allowed_headings,
+            continuation_mode=continuation_mode,
+            chunk_has_heading=chunk_has_heading,
+        )
+        if heading_fixed:
+            merged_meta["normalized_heading"] = True
+            self._emit_logic_event(
+                (
+                    f"分片 {chunk_index}/{total_chunks} 自动修复：已规范编号标题与层级"
+                ),
+                event_type="heading_normalized",
+                chunk_index=chunk_index,
+                total_chunks=total_chunks,
+                attempt=attempt_no,
+                section_id=section_id,
+                section_heading=section_heading or None,
+                section_label=section_label,
+            )
+
+        if merged_meta["source_json_blocks"] or output_json_report.get("output_json_blocks", 0):
+            self._emit_logic_event(
+                (
+                    f"分片 {chunk_index}/{total_chunks} JSON 处理：章节={section_label}，source={merged_meta['source_json_blocks']}，"
+                    f"repaired={merged_meta['repaired_json_blocks']}，"
+                    f"fallback={merged_meta['fallback_json_blocks']}"
+                ),
+                event_type="json_block_processed",
+                chunk_index=chunk_index,
+                total_chunks=total_chunks,
+                attempt=attempt_no,
+                section_id=section_id,
+                section_heading=section_heading or None,
+                section_label=section_label,
+                source_json_blocks=merged_meta["source_json_blocks"],
+                repaired_json_blocks=merged_meta["repaired_json_blocks"],
+                fallback_json_blocks=merged_meta["fallback_json_blocks"],
+                fallback_reasons=fallback_reasons[:5] if fallback_reasons else None,
+            )
+
+        valid, reason = self._validate_chunk_output(
+            source_chunk=chunk,
+            converted_chunk=converted,
+            allowed_headings=allowed_headings,
+            continuation_mode=continuation_mode,
+            llm_meta=llm_meta,
+            source_json_blocks=source_json_blocks,
+            source_error_codes=source_error_codes,
+        )
+        if valid:
+            self._emit_logic_event(
+                f"分片 {chunk_index}/{total_chunks} 校验通过（章节={section_label}，attempt={attempt_no}）",
+                event_type="chunk_validation_passed",
+                chunk_index=chunk_index,
+                total_chunks=total_chunks,
+                attempt=attempt_no,
+                section_id=section_id,
+                section_heading=section_heading or None,
+                section_label=section_label,
+            )
+        return converted, merged_meta, valid, reason
+
     def _convert_chunk_with_retry(
         self,
         chunk: str,
@@ -1651,6 +2652,9 @@ class Doc2MDAgent:
     ) -> tuple[str, dict[str, Any]]:
         """分片转换 + 严格校验重试。"""
         last_error = ""
+        # 源分片在各次尝试间不变，JSON 块和错误码只提取一次，重试时直接复用
+        source_json_blocks = self._extract_json_blocks(chunk)
+        source_error_codes = self._extract_error_codes(chunk) if "错误码" in chunk else None
         for attempt in range(self.max_chunk_retries + 1):
             self._check_stop()
             attempt_no = attempt + 1
@@ -1684,106 +2688,23 @@ class Doc2MDAgent:
                 next_heading=next_heading,
                 retry_reason=last_error if attempt > 0 else "",
             )
-            if re.match(r'^\s*```markdown\s*\n', converted):
-                converted = re.sub(r'^\s*```markdown\s*\n', '', converted)
-                converted = re.sub(r'\n```\s*$', '', converted)
-
-            converted, source_json_report = self._replace_output_json_blocks_with_source_and_report(chunk, converted)
-            converted, output_json_report = self._sanitize_output_json_blocks_with_report(converted)
-
-            fallback_reasons = source_json_report.get("fallback_reasons", []) + output_json_report.get("fallback_reasons", [])
-            merged_meta = {
-                "attempts_used": attempt_no,
-                "source_json_blocks": source_json_report.get("source_json_blocks", 0),
-                "repaired_json_blocks": (
-                    source_json_report.get("repaired_json_blocks", 0)
-                    + output_json_report.get("output_json_repaired", 0)
-                ),
-                "fallback_json_blocks": (
-                    source_json_report.get("fallback_json_blocks", 0)
-                    + output_json_report.get("output_json_fallback", 0)
-                ),
-                "fallback_reasons": fallback_reasons,
-            }
-
-            if continuation_mode:
-                converted, removed_headings = self._strip_heading_lines_outside_code_blocks(converted)
-                if removed_headings:
-                    merged_meta["removed_heading_lines"] = len(removed_headings)
-                    self._emit_logic_event(
-                        (
-                            f"分片 {chunk_index}/{total_chunks} 自动修复：续片移除了 {len(removed_headings)} 行标题"
-                        ),
-                        event_type="continuation_heading_stripped",
-                        chunk_index=chunk_index,
-                        total_chunks=total_chunks,
-                        attempt=attempt_no,
-                        section_id=section_id,
-                        section_heading=section_heading or None,
-                        section_label=section_label,
-                        removed_heading_lines=len(removed_headings),
-                        removed_headings=removed_headings[:3],
-                    )
-
-            converted, heading_fixed = self._ensure_allowed_heading_in_chunk(
-                converted_chunk=converted,
+            converted, merged_meta, valid, reason = self._postvalidate_chunk_output(
+                chunk=chunk,
+                converted=converted,
+                llm_meta=meta,
+                attempt_no=attempt_no,
+                chunk_index=chunk_index,
+                total_chunks=total_chunks,
+                section_id=section_id,
+                section_heading=section_heading,
+                section_label=section_label,
                 allowed_headings=allowed_headings,
                 continuation_mode=continuation_mode,
                 chunk_has_heading=chunk_has_heading,
-            )
-            if heading_fixed:
-                merged_meta["normalized_heading"] = True
-                self._emit_logic_event(
-                    (
-                        f"分片 {chunk_index}/{total_chunks} 自动修复：已规范编号标题与层级"
-                    ),
-                    event_type="heading_normalized",
-                    chunk_index=chunk_index,
-                    total_chunks=total_chunks,
-                    attempt=attempt_no,
-                    section_id=section_id,
-                    section_heading=section_heading or None,
-                    section_label=section_label,
-                )
-
-            if merged_meta["source_json_blocks"] or output_json_report.get("output_json_blocks", 0):
-                self._emit_logic_event(
-                    (
-                        f"分片 {chunk_index}/{total_chunks} JSON 处理：章节={section_label}，source={merged_meta['source_json_blocks']}，"
-                        f"repaired={merged_meta['repaired_json_blocks']}，"
-                        f"fallback={merged_meta['fallback_json_blocks']}"
-                    ),
-                    event_type="json_block_processed",
-                    chunk_index=chunk_index,
-                    total_chunks=total_chunks,
-                    attempt=attempt_no,
-                    section_id=section_id,
-                    section_heading=section_heading or None,
-                    section_label=section_label,
-                    source_json_blocks=merged_meta["source_json_blocks"],
-                    repaired_json_blocks=merged_meta["repaired_json_blocks"],
-                    fallback_json_blocks=merged_meta["fallback_json_blocks"],
-                    fallback_reasons=fallback_reasons[:5] if fallback_reasons else None,
-                )
-
-            valid, reason = self._validate_chunk_output(
-                source_chunk=chunk,
-                converted_chunk=converted,
-                allowed_headings=allowed_headings,
-                continuation_mode=continuation_mode,
-                llm_meta=meta,
+                source_json_blocks=source_json_blocks,
+                source_error_codes=source_error_codes,
             )
             if valid:
-                self._emit_logic_event(
-                    f"分片 {chunk_index}/{total_chunks} 校验通过（章节={section_label}，attempt={attempt_no}）",
-                    event_type="chunk_validation_passed",
-                    chunk_index=chunk_index,
-                    total_chunks=total_chunks,
-                    attempt=attempt_no,
-                    section_id=section_id,
-                    section_heading=section_heading or None,
-                    section_label=section_label,
-                )
                 return converted, merged_meta
 
             last_error = reason
@@ -1840,6 +2761,8 @@ class Doc2MDAgent:
             allowed_headings=allowed_headings,
             continuation_mode=continuation_mode,
             llm_meta={"truncated": False},
+            source_json_blocks=source_json_blocks,
+            source_error_codes=source_error_codes,
         )
 
         fallback_reasons = source_json_report.get("fallback_reasons", []) + output_json_report.get("fallback_reasons", [])
@@ -1885,27 +2808,72 @@ class Doc2MDAgent:
         )
         return fallback_chunk, fallback_meta
 
+    def _llm_cache_path(self, system_prompt: str, user_prompt: str) -> Path:
+        """缓存键：provider/model/提示词整体哈希，按前两位散列到子目录。"""
+        key_source = "\0".join((self.llm.provider_name, self.llm.model, system_prompt, user_prompt))
+        key = hashlib.sha256(key_source.encode("utf-8")).hexdigest()
+        return self._llm_cache_dir / key[:2] / key
+
+    def _chat_with_meta_cached(
+        self,
+        system_prompt: str,
+        user_prompt: str,
+        context: Optional[dict[str, Any]] = None,
+        use_cache: bool = True,
+    ) -> dict[str, Any]:
+        """带可选磁盘缓存的 LLM 调用：temperature=0 时同样的提示词应得到同样的输出。"""
+        if not (self.cache_enabled and use_cache):
+            return self.llm.chat_with_meta(system_prompt, user_prompt, context=context)
+
+        cache_path = self._llm_cache_path(system_prompt, user_prompt)
+        try:
+            cached = _json_loads(cache_path.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            cached = None
+        except Exception as exc:
+            logger.warning("LLM 缓存读取失败，忽略缓存: %s", exc)
+            cached = None
+        if isinstance(cached, dict) and cached.get("content"):
+            self._emit_logic_event(
+                f"LLM 缓存命中：{cache_path.name[:12]}…，跳过一次模型调用",
+                event_type="llm_cache_hit",
+                cache_key=cache_path.name,
+            )
+            return cached
+
+        response = self.llm.chat_with_meta(system_prompt, user_prompt, context=context)
+        if not response.get("truncated"):
+            try:
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                fd, tmp_path = tempfile.mkstemp(dir=str(cache_path.parent), suffix=".tmp")
+                with os.fdopen(fd, "w", encoding="utf-8") as tmp_file:
+                    tmp_file.write(json.dumps(response, ensure_ascii=False))
+                os.replace(tmp_path, cache_path)
+            except Exception as exc:
+                logger.warning("LLM 缓存写入失败，忽略缓存: %s", exc)
+        return response
+
     def _analyze_structure(self, content: str) -> dict:
         """调用 AI 分析文档结构"""
         self._check_stop()
         prompt = ANALYZE_STRUCTURE_USER.format(content=content)
 
         try:
-            response = self.llm.chat(
+            response = self._chat_with_meta_cached(
                 ANALYZE_STRUCTURE_SYSTEM,
                 prompt,
                 context={"operation": "analyze_structure"},
-            )
+            )["content"]
             # 去掉 ```json ``` 包裹
-            response = re.sub(r'```json\s*', '', response)
-            response = re.sub(r'```\s*', '', response)
+            response = _RE_STRUCT_FENCE_JSON.sub('', response)
+            response = _RE_STRUCT_FENCE_ANY.sub('', response)
             # 提取最外层 JSON 对象
-            json_match = re.search(r'\{[\s\S]*\}', response)
+            json_match = _RE_OUTER_JSON_OBJECT.search(response)
             if json_match:
                 json_str = json_match.group()
                 # 尝试修复常见 JSON 问题：尾随逗号
-                json_str = re.sub(r',\s*([\]}])', r'\1', json_str)
-                return json.loads(json_str)
+                json_str = _RE_TRAILING_COMMA_CLOSE.sub(r'\1', json_str)
+                return _json_loads(json_str)
         except (json.JSONDecodeError, Exception) as e:
             logger.warning(f"结构分析失败，使用默认结构: {e}")
 
@@ -1936,7 +2904,7 @@ class Doc2MDAgent:
         """调用 AI 转换一个内容片段，并返回元信息用于校验。"""
         self._check_stop()
         prompt = CONVERT_USER.format(
-            structure=json.dumps(structure, ensure_ascii=False, indent=2),
+            structure=_json_dumps_pretty(structure),
             section_id=section_id or "(none)",
             section_heading=section_heading or "(none)",
             continuation_mode=str(continuation_mode).lower(),
@@ -1951,9 +2919,13 @@ class Doc2MDAgent:
         if retry_reason:
             prompt += f"\n\n上一次输出不符合约束，失败原因：{retry_reason}\n请严格重新输出完整片段。"
 
-        response = self.llm.chat_with_meta(
+        if self._rpm_limiter:
+            self._rpm_limiter.acquire()
+        # 重试提示词带失败原因，天然与缓存键不同；此处再显式跳过，避免固化失败输出
+        response = self._chat_with_meta_cached(
             CONVERT_SYSTEM,
             prompt,
+            use_cache=not retry_reason,
             context={
                 "operation": "convert_chunk",
                 "chunk_index": chunk_index,
@@ -1967,31 +2939,20 @@ class Doc2MDAgent:
 
     def _extract_error_code_sets_by_section(self, text: str) -> list[set[str]]:
         """按“错误码”章节顺序提取错误码集合。"""
-        sections = []
-        current_heading = ""
-        current_lines: list[str] = []
-
-        for line in text.split("\n"):
-            if re.match(r'^\s*#{1,6}\s+', line):
-                if current_lines:
-                    sections.append((current_heading, "\n".join(current_lines)))
-                current_heading = re.sub(r'^\s*#{1,6}\s+', '', line).strip()
-                current_heading = self._strip_heading_attrs(current_heading)
-                current_lines = [line]
-            else:
-                if not current_lines:
-                    current_lines = [line]
-                else:
-                    current_lines.append(line)
-
-        if current_lines:
-            sections.append((current_heading, "\n".join(current_lines)))
+        # 多行正则一遍拿到所有标题行偏移，“错误码”章节直接按区间切片，
+        # 免去逐行 Python 循环和整节 join
+        headings = [
+            (match.start(), match.group(1))
+            for match in _RE_ANY_HEADING_LINE_M.finditer(text)
+        ]
 
         code_sets = []
-        for heading, section_text in sections:
-            heading_plain = re.sub(r'^\d+(?:\.\d+)*\s+', '', heading).strip()
-            if "错误码" in heading_plain:
-                code_sets.append(self._extract_error_codes(section_text))
+        for idx, (start, heading) in enumerate(headings):
+            # 编号前缀和 {#xxx} 属性都不可能含“错误码”，直接在原始标题文本上判断
+            if "错误码" not in heading:
+                continue
+            end = headings[idx + 1][0] if idx + 1 < len(headings) else len(text)
+            code_sets.append(self._extract_error_codes(text[start:end]))
         return code_sets
 
     def _validate_final_output(self, raw_md: str, final_md: str, expected_headings: list[str]) -> None:
@@ -2001,30 +2962,25 @@ class Doc2MDAgent:
         # 1) 标题序列完整性校验
         if expected_headings:
             expected_norm = [self._normalize_heading_text(h) for h in expected_headings]
-            actual = self._extract_numbered_headings(final_md)
+            actual = self._extract_numbered_headings(self._remove_fenced_code_blocks(final_md))
             actual_norm = [self._normalize_heading_text(h) for h in actual]
 
             expected_counter = Counter(expected_norm)
             actual_counter = Counter(actual_norm)
 
-            missing = []
-            extras = []
-            for heading, count in expected_counter.items():
-                diff = count - actual_counter.get(heading, 0)
-                if diff > 0:
-                    missing.extend([heading] * diff)
-            for heading, count in actual_counter.items():
-                diff = count - expected_counter.get(heading, 0)
-                if diff > 0:
-                    extras.extend([heading] * diff)
-
-            if missing:
-                issues.append(f"缺失标题 {len(missing)} 个，例如: {missing[:self.max_validation_report_items]}")
-            if extras:
-                issues.append(f"新增/重复标题 {len(extras)} 个，例如: {extras[:self.max_validation_report_items]}")
+            # Counter 减法在 C 层完成差集统计；报告只需总数和前几个样例，不必物化完整列表
+            missing_counter = expected_counter - actual_counter
+            extras_counter = actual_counter - expected_counter
+
+            if missing_counter:
+                samples = list(islice(missing_counter.elements(), self.max_validation_report_items))
+                issues.append(f"缺失标题 {sum(missing_counter.values())} 个，例如: {samples}")
+            if extras_counter:
+                samples = list(islice(extras_counter.elements(), self.max_validation_report_items))
+                issues.append(f"新增/重复标题 {sum(extras_counter.values())} 个，例如: {samples}")
 
         # 2) 文档主标题只允许 1 个
-        h1_count = len(re.findall(r'^#\s+.+$', self._remove_fenced_code_blocks(final_md), flags=re.MULTILINE))
+        h1_count = _count_h1_outside_fences(final_md)
         if h1_count > 1:
             issues.append(f"文档一级标题重复: {h1_count} 个")
 
@@ -2035,12 +2991,12 @@ class Doc2MDAgent:
             if idx >= len(raw_code_sets):
                 if final_codes:
                     issues.append(
-                        f"错误码章节数量超出原文（第 {idx + 1} 节），新增代码示例: {sorted(final_codes)[:self.max_validation_report_items]}"
+                        f"错误码章节数量超出原文（第 {idx + 1} 节），新增代码示例: {heapq.nsmallest(self.max_validation_report_items, final_codes)}"
                     )
                 continue
             raw_codes = raw_code_sets[idx]
             if raw_codes and final_codes and not final_codes.issubset(raw_codes):
-                extras = sorted(final_codes - raw_codes)[:self.max_validation_report_items]
+                extras = heapq.nsmallest(self.max_validation_report_items, final_codes - raw_codes)
                 issues.append(f"错误码章节第 {idx + 1} 节存在原文未出现编码: {extras}")
 
         # 4) JSON 代码块必须可解析（允许掩码字段做轻量修复后解析）
@@ -2060,20 +3016,25 @@ class Doc2MDAgent:
     def _generate_toc(self, markdown: str) -> str:
         """从最终 markdown 中提取标题并生成目录（跳过一级标题/文档标题）"""
         self._check_stop()
-        headings = []
-        for line in markdown.split("\n"):
-            match = re.match(r'^(#{2,6})\s+(.+)$', line)
-            if match:
-                level = len(match.group(1))
-                title = self._strip_heading_attrs(match.group(2).strip())
-                if title == "目录":
-                    continue
-                headings.append(f"{'  ' * (level - 2)}- {title}")
+        subheadings = _collect_subheadings(markdown)
 
-        if not headings:
+        if not subheadings:
             return ""
 
-        headings_text = "\n".join(headings)
+        # 标题很少时目录结构一目了然，直接走简单目录，省掉一次 LLM 往返
+        if len(subheadings) <= self.toc_llm_threshold:
+            self._emit_event(
+                {
+                    "type": "toc_simple_shortcut",
+                    "heading_count": len(subheadings),
+                    "message": f"标题仅 {len(subheadings)} 个（阈值 {self.toc_llm_threshold}），跳过 AI 目录生成",
+                }
+            )
+            return self._simple_toc(markdown, subheadings=subheadings)
+
+        headings_text = "\n".join(
+            f"{'  ' * (level - 2)}- {title}" for level, title in subheadings
+        )
 
         try:
             prompt = GENERATE_TOC_USER.format(headings=headings_text)
@@ -2091,30 +3052,27 @@ class Doc2MDAgent:
                     "message": f"目录生成失败，已切换简单目录策略：{e}",
                 }
             )
-            return self._simple_toc(markdown)
+            return self._simple_toc(markdown, subheadings=subheadings)
 
     def _strip_heading_attrs(self, title: str) -> str:
         """去除标题中残留的 {#xxx} 等属性"""
-        return re.sub(r'\s*\{#[^}]*\}\s*$', '', title).strip()
+        return _strip_heading_attrs(title)
 
-    def _simple_toc(self, markdown: str) -> str:
-        """简单的目录生成（不依赖 AI），跳过一级标题和目录标题"""
+    def _simple_toc(self, markdown: str, subheadings: Optional[list[tuple[int, str]]] = None) -> str:
+        """简单的目录生成（不依赖 AI），跳过一级标题和目录标题。可复用已提取的标题列表。"""
+        if subheadings is None:
+            subheadings = _collect_subheadings(markdown)
         toc_lines = []
-        for line in markdown.split("\n"):
-            match = re.match(r'^(#{2,6})\s+(.+)$', line)
-            if match:
-                title = self._strip_heading_attrs(match.group(2).strip())
-                if title == "目录":
-                    continue
-                section_id = self._extract_section_id(title)
-                if section_id:
-                    level = self._heading_level_from_section_id(section_id)
-                else:
-                    level = len(match.group(1))
-                anchor = re.sub(r'[^\w\u4e00-\u9fff\s-]', '', title.lower())
-                anchor = anchor.strip().replace(' ', '-')
-                indent = "  " * (level - 2)
-                toc_lines.append(f"{indent}- [{title}](#{anchor})")
+        for heading_level, title in subheadings:
+            section_id = self._extract_section_id(title)
+            if section_id:
+                level = self._heading_level_from_section_id(section_id)
+            else:
+                level = heading_level
+            anchor = title.lower().translate(_ANCHOR_DELETE_TABLE)
+            anchor = anchor.strip().replace(' ', '-')
+            indent = "  " * (level - 2)
+            toc_lines.append(f"{indent}- [{title}](#{anchor})")
 
         return "\n".join(toc_lines)
 
@@ -2124,44 +3082,36 @@ class Doc2MDAgent:
             return markdown
 
         cleaned_markdown = self._remove_existing_toc_blocks(markdown)
-        lines = cleaned_markdown.split("\n")
-        numbered_heading_pattern = re.compile(r'^\s*#{1,6}\s+\d+(?:\.\d+)*\s+')
 
         # 优先插在第一个编号章节前，避免目录插到正文中段
-        insert_pos = -1
-        for i, line in enumerate(lines):
-            if numbered_heading_pattern.match(line):
-                insert_pos = i
-                break
-
-        # 兜底策略：沿用旧逻辑，避免无编号文档插入失败
-        if insert_pos < 0:
-            title_pos = -1
-            for i, line in enumerate(lines):
-                if line.startswith("# ") and not line.startswith("## "):
-                    title_pos = i
-                    break
-            if title_pos < 0:
-                title_pos = 0
-            insert_pos = title_pos + 1
-            for i in range(title_pos + 1, len(lines)):
-                if re.match(r'^#{2,6}\s+', lines[i]):
-                    insert_pos = i
-                    break
+        # 直接在字符串上定位插入偏移，省去整篇 split/insert/join 的拷贝
+        numbered = _RE_NUMBERED_HEADING_LINE_M.search(cleaned_markdown)
+        if numbered:
+            insert_at = numbered.start()
+        else:
+            # 兜底策略：沿用旧逻辑，避免无编号文档插入失败
+            title_match = _RE_TITLE_H1_LINE_M.search(cleaned_markdown)
+            title_end = cleaned_markdown.find("\n", title_match.start() if title_match else 0)
+            if title_end < 0:
+                # 标题就是最后一行，目录只能追加到文末
+                insert_at = -1
+            else:
+                sub_match = _RE_SUBHEADING_LINE_M.search(cleaned_markdown, title_end + 1)
+                insert_at = sub_match.start() if sub_match else title_end + 1
 
         # 如果插入位置前面已有 ---，就移除它避免重复
-        check_pos = insert_pos - 1
-        while check_pos >= 0 and lines[check_pos].strip() == "":
-            check_pos -= 1
-        has_separator_before = check_pos >= 0 and lines[check_pos].strip() == "---"
+        before = cleaned_markdown[:insert_at] if insert_at >= 0 else cleaned_markdown
+        trimmed = before.rstrip()
+        has_separator_before = trimmed[trimmed.rfind("\n") + 1:].lstrip() == "---"
 
         if has_separator_before:
             toc_block = f"\n## 目录\n\n{toc}\n\n---\n"
         else:
             toc_block = f"\n---\n\n## 目录\n\n{toc}\n\n---\n"
-        lines.insert(insert_pos, toc_block)
 
-        return "\n".join(lines)
+        if insert_at < 0:
+            return f"{cleaned_markdown}\n{toc_block}"
+        return f"{cleaned_markdown[:insert_at]}{toc_block}\n{cleaned_markdown[insert_at:]}"
 
     def _remove_existing_toc_blocks(self, markdown: str) -> str:
         """
@@ -2169,65 +3119,16 @@ class Doc2MDAgent:
         目录块判定规则：
         - 标题为“目录”
         - 后续主体为 Markdown 链接列表（支持嵌套缩进）
+        整块形状由 _RE_TOC_BLOCK 一次匹配，正文无目录时为纯 C 扫描
         """
-        lines = markdown.split("\n")
-        heading_pattern = re.compile(r'^\s*#{1,6}\s+目录\s*$')
-        toc_item_pattern = re.compile(r'^\s*[-*+]\s+\[[^\]]+\]\(#.+\)\s*$')
-
-        i = 0
-        removed_any = False
-        while i < len(lines):
-            if not heading_pattern.match(lines[i]):
-                i += 1
-                continue
-
-            # 识别目录正文范围
-            j = i + 1
-            saw_toc_item = False
-            while j < len(lines):
-                stripped = lines[j].strip()
-                if not stripped:
-                    j += 1
-                    continue
-                if stripped == "---":
-                    j += 1
-                    break
-                if toc_item_pattern.match(lines[j]):
-                    saw_toc_item = True
-                    j += 1
-                    continue
-                if re.match(r'^\s*#{1,6}\s+', lines[j]):
-                    break
-                # 非目录项文本，避免误删正文中的“目录”章节
-                if not saw_toc_item:
-                    break
-                break
-
-            if not saw_toc_item:
-                i += 1
-                continue
-
-            start = i
-            end = j
-
-            # 尽量连同目录前的分隔线一起移除
-            k = start - 1
-            while k >= 0 and not lines[k].strip():
-                k -= 1
-            if k >= 0 and lines[k].strip() == "---":
-                start = k
-
-            # 目录后如果紧跟空行，顺带收缩
-            while end < len(lines) and not lines[end].strip():
-                end += 1
-
-            lines = lines[:start] + lines[end:]
-            removed_any = True
-            i = max(start - 1, 0)
-
-        if not removed_any:
+        if "目录" not in markdown:
             return markdown
-        return "\n".join(lines)
+        # 删除后前文的分隔线可能与下一个目录块相邻，循环到稳定（正常文档一轮即收敛）
+        while True:
+            cleaned = _RE_TOC_BLOCK.sub('', markdown)
+            if cleaned == markdown:
+                return markdown
+            markdown = cleaned
 
     def _is_markdown_table_line(self, line: str) -> bool:
         stripped = line.strip()
@@ -2240,7 +3141,7 @@ class Doc2MDAgent:
     def _is_markdown_table_separator(self, row: list[str]) -> bool:
         if not row:
             return False
-        return all(bool(re.fullmatch(r':?-{3,}:?', cell.strip())) for cell in row)
+        return all(_is_table_delim_cell(cell.strip()) for cell in row)
 
     def _parse_markdown_table_block(self, block_lines: list[str]) -> tuple[list[str], list[list[str]]] | None:
         if len(block_lines) < 2:
@@ -2265,7 +3166,7 @@ class Doc2MDAgent:
         def normalize_cell_for_render(cell: str) -> str:
             value = (cell or "").rstrip()
             # 层级符号前的缩进用于表达树层次，不能 strip 掉前导空白
-            if re.match(r'^\s*[└├]─', value):
+            if _RE_TREE_ROW_PREFIX.match(value):
                 return value
             return value.strip()
 
@@ -2283,12 +3184,14 @@ class Doc2MDAgent:
 
     def _normalize_field_name_for_match(self, text: str) -> str:
         normalized = text.strip()
-        normalized = re.sub(r'^\s*#{1,6}\s+', '', normalized)
+        heading = _RE_HEADING_PREFIX.match(normalized)
+        if heading:
+            normalized = normalized[heading.end():]
         normalized = normalized.strip("*` ").strip()
         normalized = normalized.lstrip("└─").lstrip("├─").strip()
         normalized = normalized.replace("[]", "")
-        normalized = re.sub(r'\s+', '', normalized)
-        return normalized
+        # split/join 去空白与 \s 正则替换等价，纯 C 字符串操作
+        return "".join(normalized.split())
 
     def _row_matches_parent_field(self, row_name: str, parent_name: str) -> bool:
         row_norm = self._normalize_field_name_for_match(row_name)
@@ -2327,23 +3230,10 @@ class Doc2MDAgent:
         stripped = line.strip()
         if not stripped:
             return ""
-        stripped = re.sub(r'^\s*#{1,6}\s+', '', stripped).strip()
+        stripped = _RE_HEADING_PREFIX.sub('', stripped).strip()
         if stripped.startswith("**") and stripped.endswith("**") and len(stripped) >= 4:
             stripped = stripped[2:-2].strip()
-        patterns = [
-            re.compile(
-                r'^(?:请求参数|返回参数|入参|出参|request|response)?\s*'
-                r'(?:`)?([A-Za-z0-9_\-\u4e00-\u9fff.\[\]]+)(?:`)?\s*'
-                r'(?:对象|参数|字段)?\s*(?:字段|参数)?\s*(?:说明|结构|详情|定义)\s*[:：]?$',
-                flags=re.IGNORECASE,
-            ),
-            re.compile(
-                r'^(?:`)?([A-Za-z0-9_\-\u4e00-\u9fff.\[\]]+)(?:`)?\s*'
-                r'(?:对象)?\s*(?:字段|参数)\s*[:：]$',
-                flags=re.IGNORECASE,
-            ),
-        ]
-        for pattern in patterns:
+        for pattern in _HIER_PARENT_PATTERNS:
             match = pattern.match(stripped)
             if match:
                 return match.group(1).strip()
@@ -2380,12 +3270,14 @@ class Doc2MDAgent:
         return cells
 
     def _normalize_indented_hierarchy_in_tables(self, markdown: str) -> str:
+        return "\n".join(self._normalize_indented_hierarchy_in_tables_lines(markdown.split("\n")))
+
+    def _normalize_indented_hierarchy_in_tables_lines(self, lines: list[str]) -> list[str]:
         """
         同一张表内识别“子字段缩进”并规范为 `└─字段名`：
         - 识别名称列前导空白更深的行
         - 识别 `parent.child` / `parent[].child` 前缀行
         """
-        lines = markdown.split("\n")
         result: list[str] = []
         i = 0
 
@@ -2484,12 +3376,12 @@ class Doc2MDAgent:
             else:
                 result.extend(block)
 
-        return "\n".join(result)
+        return result
 
     def _clean_table_field_name(self, value: str) -> str:
         text = (value or "").strip().strip("*` ")
         text = text.replace("&nbsp;", " ")
-        text = re.sub(r'^\s*[└├]─\s*', '', text)
+        text = _RE_TREE_ROW_PREFIX_STRIP.sub('', text)
         return text.strip()
 
     def _extract_leaf_field_name(self, value: str) -> str:
@@ -2526,11 +3418,11 @@ class Doc2MDAgent:
         search_end = min(len(lines), start_idx + 220)
         i = start_idx
         while i < search_end:
-            if i > start_idx and re.match(r'^\s*#{2,6}\s+', lines[i]):
+            if i > start_idx and _RE_SUBHEADING_PREFIX.match(lines[i]):
                 break
 
             stripped = lines[i].strip()
-            fence_match = re.match(r'^(`{3,})([A-Za-z0-9_-]*)\s*$', stripped)
+            fence_match = _RE_FENCE_OPEN_LINE.match(stripped)
             if not fence_match:
                 i += 1
                 continue
@@ -2541,7 +3433,7 @@ class Doc2MDAgent:
             body_lines: list[str] = []
             closed = False
             while j < search_end:
-                if re.match(rf'^{re.escape(fence)}\s*$', lines[j].strip()):
+                if lines[j].strip() == fence:
                     closed = True
                     break
                 body_lines.append(lines[j])
@@ -2559,13 +3451,10 @@ class Doc2MDAgent:
             if lang not in {"", "json"} and not body.startswith(("{", "[")):
                 continue
 
-            normalized, ok = self._normalize_json_block(body)
-            if not ok:
-                continue
-            try:
-                return json.loads(normalized)
-            except Exception:
-                continue
+            diagnostic = self._normalize_json_block_with_diagnostics(body)
+            if diagnostic["ok"]:
+                # 直接复用诊断里的解析结果，省去 dumps→loads 往返
+                return diagnostic["parsed"]
         return None
 
     def _match_table_row_depths_with_json(
@@ -2616,7 +3505,7 @@ class Doc2MDAgent:
         return f"{indent}└─{field_name}"
 
     def _extract_marker_depth(self, value: str) -> int:
-        match = re.match(r'^(\s*)[└├]─', (value or ""))
+        match = _RE_TREE_INDENT_PREFIX.match(value or "")
         if not match:
             return 0
         spaces = len(match.group(1))
@@ -2646,7 +3535,7 @@ class Doc2MDAgent:
         if len(row) <= name_col:
             return False
         name = row[name_col]
-        if not re.search(r'[└├]─', name):
+        if not _RE_TREE_MARKER.search(name):
             return False
 
         row_type = row[type_col].strip() if type_col < len(row) else ""
@@ -2665,10 +3554,12 @@ class Doc2MDAgent:
         return desc == ""
 
     def _normalize_hierarchy_from_nearby_json_examples(self, markdown: str) -> str:
+        return "\n".join(self._normalize_hierarchy_from_nearby_json_examples_lines(markdown.split("\n")))
+
+    def _normalize_hierarchy_from_nearby_json_examples_lines(self, lines: list[str]) -> list[str]:
         """
         参考表格后方的 JSON 返回示例，修正参数表中 `└─` 的层级缩进。
         """
-        lines = markdown.split("\n")
         result: list[str] = []
         i = 0
 
@@ -2741,14 +3632,16 @@ class Doc2MDAgent:
             else:
                 result.extend(block)
 
-        return "\n".join(result)
+        return result
 
     def _normalize_hierarchy_with_object_row_fallback(self, markdown: str) -> str:
+        return "\n".join(self._normalize_hierarchy_with_object_row_fallback_lines(markdown.split("\n")))
+
+    def _normalize_hierarchy_with_object_row_fallback_lines(self, lines: list[str]) -> list[str]:
         """
         在缺少可用 JSON 示例时，仅基于同表中的对象父行推断层级。
         仅在“当前几乎全是一层 `└─`”时触发，避免覆盖已有正确层级。
         """
-        lines = markdown.split("\n")
         result: list[str] = []
         i = 0
 
@@ -2789,8 +3682,7 @@ class Doc2MDAgent:
                 )
                 for idx, row in enumerate(rows)
                 if len(row) > name_col and (
-                    re.search(
-                        r'[└├]─',
+                    _RE_TREE_MARKER.search(
                         raw_cells_rows[idx][name_col]
                         if idx < len(raw_cells_rows) and len(raw_cells_rows[idx]) > name_col
                         else row[name_col],
@@ -2815,7 +3707,7 @@ class Doc2MDAgent:
                     continue
 
                 name = row[name_col]
-                is_marker = bool(re.search(r'[└├]─', name))
+                is_marker = bool(_RE_TREE_MARKER.search(name))
                 row_type = row[type_col].strip() if type_col < len(row) else ""
 
                 if not is_marker:
@@ -2829,7 +3721,7 @@ class Doc2MDAgent:
                 for next_idx in range(row_idx + 1, len(rows)):
                     if len(rows[next_idx]) <= name_col:
                         continue
-                    if re.search(r'[└├]─', rows[next_idx][name_col]):
+                    if _RE_TREE_MARKER.search(rows[next_idx][name_col]):
                         has_next_marker_row = True
                         break
 
@@ -2884,14 +3776,16 @@ class Doc2MDAgent:
 
             result.extend(self._render_markdown_table(header, rows))
 
-        return "\n".join(result)
+        return result
 
     def _merge_hierarchical_field_tables(self, markdown: str) -> str:
+        return "\n".join(self._merge_hierarchical_field_tables_lines(markdown.split("\n")))
+
+    def _merge_hierarchical_field_tables_lines(self, lines: list[str]) -> list[str]:
         """
         合并“主表 + xxx 对象字段说明子表”：
         在同一张表内以 `└─` 标记子字段，避免分段描述。
         """
-        lines = markdown.split("\n")
         i = 0
 
         while i < len(lines):
@@ -2971,14 +3865,16 @@ class Doc2MDAgent:
             lines = lines[:prev_start] + merged_table_lines + lines[next_end + 1:]
             i = prev_start + len(merged_table_lines)
 
-        return "\n".join(lines)
+        return lines
 
     def _flatten_residual_grid_table_rows(self, markdown: str) -> str:
+        return "\n".join(self._flatten_residual_grid_table_rows_lines(markdown.split("\n")))
+
+    def _flatten_residual_grid_table_rows_lines(self, lines: list[str]) -> list[str]:
         """
         处理残留的 pandoc 网格表片段（如 `|   +----+` / `|   | field |`）：
         将其子字段行并入上一张 Markdown 表，并使用 `└─` 标记层级。
         """
-        lines = markdown.split("\n")
         result: list[str] = []
         i = 0
 
@@ -2990,7 +3886,7 @@ class Doc2MDAgent:
 
         while i < len(lines):
             line = lines[i]
-            if not re.match(r'^\|\s*\+-+', line):
+            if not _RE_PIPE_GRID_BORDER.match(line):
                 result.append(line)
                 i += 1
                 continue
@@ -3002,7 +3898,7 @@ class Doc2MDAgent:
                     block.append(current)
                     i += 1
                     break
-                if current.startswith("|") or re.match(r'^\+-+', current):
+                if current.startswith("|") or _RE_GRID_BORDER_PREFIX.match(current):
                     block.append(current)
                     i += 1
                     continue
@@ -3015,7 +3911,7 @@ class Doc2MDAgent:
             child_rows: list[tuple[str, str, str]] = []
             for row_line in block:
                 # 目标行形态：|   | field | type | desc |
-                row_match = re.match(r'^\|\s*\|\s*([^|]+?)\s*\|\s*([^|]+?)\s*\|\s*([^|]+?)\s*\|$', row_line)
+                row_match = _RE_NESTED_GRID_ROW.match(row_line)
                 if not row_match:
                     continue
                 name = row_match.group(1).strip()
@@ -3068,7 +3964,7 @@ class Doc2MDAgent:
             if i < len(lines) and not lines[i - 1].strip():
                 result.append("")
 
-        return "\n".join(result)
+        return result
 
     def _split_grid_row_cells(self, row_line: str) -> list[str]:
         stripped = row_line.strip()
@@ -3113,19 +4009,21 @@ class Doc2MDAgent:
         return all(not row[idx].strip() for idx in range(len(row)) if idx != desc_col)
 
     def _convert_residual_grid_tables(self, markdown: str) -> str:
+        return "\n".join(self._convert_residual_grid_tables_lines(markdown.split("\n")))
+
+    def _convert_residual_grid_tables_lines(self, lines: list[str]) -> list[str]:
         """
         将残留 grid table（+---- 边框）转换为标准 Markdown 表格：
         - 保留原始列数（3 列/4 列等）
         - 依据前导空列推断层级（用于 `records -> accountId` 等）
         - 合并“仅说明列有内容”的换行行
         """
-        lines = markdown.split("\n")
         result: list[str] = []
         i = 0
 
         while i < len(lines):
             line = lines[i]
-            if not re.match(r'^\+[:=\-]+', line):
+            if not _RE_GRID_BORDER_ANY.match(line):
                 result.append(line)
                 i += 1
                 continue
@@ -3142,7 +4040,7 @@ class Doc2MDAgent:
                 cells = self._split_grid_row_cells(row_line)
                 if not cells:
                     continue
-                if all(re.fullmatch(r'[:=\-+ ]*', cell or "") for cell in cells):
+                if all(_RE_GRID_FILLER_CELL.fullmatch(cell or "") for cell in cells):
                     continue
                 if all(not cell.strip() for cell in cells):
                     continue
@@ -3216,7 +4114,7 @@ class Doc2MDAgent:
                 result.append(lines[i])
                 i += 1
 
-        return "\n".join(result)
+        return result
 
     def _split_loose_table_cells(self, line: str, prefer_wide_gap: bool = False) -> list[str]:
         stripped = line.strip()
@@ -3224,20 +4122,20 @@ class Doc2MDAgent:
             return []
 
         if "\t" in stripped:
-            by_tab = [cell.strip() for cell in re.split(r'\t+', stripped) if cell.strip()]
+            by_tab = [cell.strip() for cell in _RE_TAB_SPLIT.split(stripped) if cell.strip()]
             if len(by_tab) >= 2:
                 return by_tab
 
         if prefer_wide_gap:
-            by_wide_gap = [cell.strip() for cell in re.split(r'\s{2,}', stripped) if cell.strip()]
+            by_wide_gap = [cell.strip() for cell in _RE_WIDE_GAP_SPLIT.split(stripped) if cell.strip()]
             if len(by_wide_gap) >= 2:
                 return by_wide_gap
 
-        by_wide_gap = [cell.strip() for cell in re.split(r'\s{2,}', stripped) if cell.strip()]
+        by_wide_gap = [cell.strip() for cell in _RE_WIDE_GAP_SPLIT.split(stripped) if cell.strip()]
         if len(by_wide_gap) >= 2:
             return by_wide_gap
 
-        return [cell.strip() for cell in re.split(r'\s+', stripped) if cell.strip()]
+        return stripped.split()
 
     def _fit_table_cells(self, cells: list[str], expected_cols: int) -> list[str]:
         if expected_cols <= 0:
@@ -3254,16 +4152,18 @@ class Doc2MDAgent:
         stripped = line.strip()
         if not stripped or stripped.startswith(("+", "|")):
             return False
-        segments = [seg for seg in re.split(r'\s+', stripped) if seg]
+        segments = stripped.split()
         if len(segments) < 2:
             return False
-        return all(bool(re.fullmatch(r':?-{3,}:?', seg)) for seg in segments)
+        return all(_is_table_delim_cell(seg) for seg in segments)
 
     def _convert_pandoc_simple_tables(self, markdown: str) -> str:
+        return "\n".join(self._convert_pandoc_simple_tables_lines(markdown.split("\n")))
+
+    def _convert_pandoc_simple_tables_lines(self, lines: list[str]) -> list[str]:
         """
         将 pandoc simple table（由 `----- -----` 包围）转换为标准 Markdown 表格。
         """
-        lines = markdown.split("\n")
         result: list[str] = []
         i = 0
 
@@ -3314,7 +4214,7 @@ class Doc2MDAgent:
 
             result.extend(lines[start:i])
 
-        return "\n".join(result)
+        return result
 
     def _looks_like_plain_table_header(self, cells: list[str]) -> bool:
         if len(cells) < 3:
@@ -3341,10 +4241,12 @@ class Doc2MDAgent:
         return hit_count >= 2
 
     def _convert_plain_text_tabular_blocks(self, markdown: str) -> str:
+        return "\n".join(self._convert_plain_text_tabular_blocks_lines(markdown.split("\n")))
+
+    def _convert_plain_text_tabular_blocks_lines(self, lines: list[str]) -> list[str]:
         """
         将“名称 类型 必填 说明”这类纯文本伪表格转换为 Markdown 表格。
         """
-        lines = markdown.split("\n")
         result: list[str] = []
         i = 0
         in_code_block = False
@@ -3367,7 +4269,7 @@ class Doc2MDAgent:
             if (
                 not stripped
                 or stripped.startswith(("#", "-", "*", ">", "|", "+"))
-                or re.match(r'^\d+\.\s+', stripped)
+                or _RE_ORDERED_ITEM_PREFIX.match(stripped)
             ):
                 result.append(line)
                 i += 1
@@ -3394,7 +4296,7 @@ class Doc2MDAgent:
                     break
                 if current_stripped.startswith(("```", "#", "-", "*", ">", "|", "+")):
                     break
-                if re.match(r'^\d+\.\s+', current_stripped):
+                if _RE_ORDERED_ITEM_PREFIX.match(current_stripped):
                     break
 
                 row_cells = self._split_loose_table_cells(current_stripped)
@@ -3412,13 +4314,15 @@ class Doc2MDAgent:
             result.extend(self._render_markdown_table(header_cells, rows))
             i = j
 
-        return "\n".join(result)
+        return result
 
     def _merge_wrapped_description_rows_in_tables(self, markdown: str) -> str:
+        return "\n".join(self._merge_wrapped_description_rows_in_tables_lines(markdown.split("\n")))
+
+    def _merge_wrapped_description_rows_in_tables_lines(self, lines: list[str]) -> list[str]:
         """
         合并 Markdown 表格中“仅说明列有值”的换行行，避免出现空字段占位行。
         """
-        lines = markdown.split("\n")
         result: list[str] = []
         i = 0
 
@@ -3468,14 +4372,16 @@ class Doc2MDAgent:
             else:
                 result.extend(block)
 
-        return "\n".join(result)
+        return result
 
     def _expand_required_only_tables_with_description(self, markdown: str) -> str:
+        return "\n".join(self._expand_required_only_tables_with_description_lines(markdown.split("\n")))
+
+    def _expand_required_only_tables_with_description_lines(self, lines: list[str]) -> list[str]:
         """
         将 `名称|类型|必填` 三列表扩展为 `名称|类型|必填|说明` 四列表。
         同时把“必填列中混入的说明文本”拆到说明列。
         """
-        lines = markdown.split("\n")
         result: list[str] = []
         i = 0
 
@@ -3517,7 +4423,7 @@ class Doc2MDAgent:
                 required_text = current[required_col].strip()
                 desc_text = ""
 
-                match = re.match(r'^(是/否|否/是|是|否)(.*)$', required_text)
+                match = _RE_REQUIRED_FLAG_PREFIX.match(required_text)
                 if match:
                     required_value = match.group(1).strip()
                     desc_text = match.group(2).strip()
@@ -3534,22 +4440,18 @@ class Doc2MDAgent:
             else:
                 result.extend(block)
 
-        return "\n".join(result)
+        return result
 
     def _normalize_api_label_lines(self, markdown: str) -> str:
+        return "\n".join(self._normalize_api_label_lines_lines(markdown.split("\n")))
+
+    def _normalize_api_label_lines_lines(self, lines: list[str]) -> list[str]:
         """
         规范接口文档中的标签行格式，例如：
         `请求方式：GET` -> `**请求方式：** GET`
         """
-        lines = markdown.split("\n")
         result: list[str] = []
         in_code_block = False
-        label_pattern = re.compile(
-            r'^\s*(接口地址|请求方式|接口描述|请求参数|返回参数|请求示例|返回示例|响应示例|接口说明|注意事项|注意)\s*[：:]\s*(.*)$'
-        )
-        bold_label_pattern = re.compile(
-            r'^\s*\*\*(接口地址|请求方式|接口描述|请求参数|返回参数|请求示例|返回示例|响应示例|接口说明|注意事项|注意)\s*[：:]\*\*\s*(.*)$'
-        )
 
         for line in lines:
             stripped = line.strip()
@@ -3562,7 +4464,7 @@ class Doc2MDAgent:
                 result.append(line)
                 continue
 
-            bold_match = bold_label_pattern.match(line)
+            bold_match = _RE_API_BOLD_LABEL_LINE.match(line)
             if bold_match:
                 label = bold_match.group(1).strip()
                 value = bold_match.group(2).strip()
@@ -3572,7 +4474,7 @@ class Doc2MDAgent:
                     result.append(f"**{label}：**")
                 continue
 
-            match = label_pattern.match(line)
+            match = _RE_API_LABEL_LINE.match(line)
             if not match:
                 result.append(line)
                 continue
@@ -3584,24 +4486,26 @@ class Doc2MDAgent:
             else:
                 result.append(f"**{label}：**")
 
-        return "\n".join(result)
+        return result
 
     def _is_curl_continuation_line(self, line: str) -> bool:
         stripped = line.strip()
         if not stripped:
             return False
         return bool(
-            re.match(r'^\\?--[A-Za-z0-9_-]+', stripped)
-            or re.match(r'^\\?-[A-Za-z]\b', stripped)
+            _RE_CLI_LONG_OPTION.match(stripped)
+            or _RE_CLI_SHORT_OPTION.match(stripped)
         )
 
     def _wrap_curl_commands_in_code_blocks(self, markdown: str) -> str:
+        return "\n".join(self._wrap_curl_commands_in_code_blocks_lines(markdown.split("\n")))
+
+    def _wrap_curl_commands_in_code_blocks_lines(self, lines: list[str]) -> list[str]:
         """
         修复/补齐 curl 示例代码块：
         - 将裸露的 curl 命令包裹为 ```bash
         - 若已有代码块只包住首行，自动吸收后续续行参数
         """
-        lines = markdown.split("\n")
         result: list[str] = []
         i = 0
 
@@ -3652,13 +4556,13 @@ class Doc2MDAgent:
             line = lines[i]
             stripped = line.strip()
 
-            fence_match = re.match(r'^(`{3,})([A-Za-z0-9_-]*)\s*$', stripped)
+            fence_match = _RE_FENCE_OPEN_LINE.match(stripped)
             if fence_match:
                 fence = fence_match.group(1)
                 j = i + 1
                 block_lines: list[str] = []
                 while j < len(lines):
-                    if re.match(rf'^{re.escape(fence)}\s*$', lines[j].strip()):
+                    if lines[j].strip() == fence:
                         break
                     block_lines.append(lines[j].rstrip())
                     j += 1
@@ -3670,7 +4574,7 @@ class Doc2MDAgent:
                     break
 
                 closing_line = lines[j]
-                if any(re.match(r'^\s*curl\b', block_line) for block_line in block_lines):
+                if any(_RE_CURL_LINE.match(block_line) for block_line in block_lines):
                     block_lines, next_idx = extend_with_continuations(block_lines, j + 1)
                     result.append(line)
                     result.extend(block_lines)
@@ -3684,7 +4588,7 @@ class Doc2MDAgent:
                 i = j + 1
                 continue
 
-            if not re.match(r'^\s*curl\b', line):
+            if not _RE_CURL_LINE.match(line):
                 result.append(line)
                 i += 1
                 continue
@@ -3696,15 +4600,13 @@ class Doc2MDAgent:
             result.extend(block_lines)
             result.append("```")
 
-        return "\n".join(result)
+        return result
 
     def _normalize_json_fenced_blocks(self, markdown: str) -> str:
         """
         将可解析的围栏代码块统一为格式化的 ```json，提升可读性。
         仅处理空语言或 json 语言围栏，避免误改 bash 等示例。
         """
-        pattern = re.compile(r'```([A-Za-z0-9_-]*)\s*\n([\s\S]*?)\n```')
-
         def repl(match: re.Match[str]) -> str:
             lang = (match.group(1) or "").strip().lower()
             if lang not in {"", "json"}:
@@ -3718,83 +4620,74 @@ class Doc2MDAgent:
             if not ok:
                 return match.group(0)
 
-            try:
-                parsed = json.loads(normalized)
-            except Exception:
-                return match.group(0)
-
-            pretty = json.dumps(parsed, ensure_ascii=False, indent=2)
-            return self._fence_code_block(pretty, language="json")
+            # normalized 本身就是 _json_dumps_pretty 的输出，无需再 loads/dumps 一轮
+            return self._fence_code_block(normalized, language="json")
 
-        return pattern.sub(repl, markdown)
+        return _RE_NORMALIZABLE_FENCE.sub(repl, markdown)
 
     def _fix_image_paths(self, markdown: str, mapping: dict) -> str:
         """修复图片路径引用"""
-        result = markdown
+        # 映射键预编译为长度降序的 alternation，避免每个图片引用都重排并线性扫描映射表
+        mapping_pattern = None
+        if mapping:
+            mapping_pattern = re.compile(
+                "|".join(re.escape(key) for key in sorted(mapping, key=len, reverse=True))
+            )
 
-        # 去掉 pandoc 的 width/height 属性
-        result = re.sub(
-            r'\{width="[^"]*"\s*height="[^"]*"\}',
-            '',
-            result
-        )
+        image_dir_prefix = f"{self.image_dir}/"
+        doubled_prefix = image_dir_prefix * 2
 
-        # 只在 markdown 图片语法 ![...](path) 中替换路径
-        def replace_image_path(m):
-            alt = m.group(1)
-            path = m.group(2)
+        # width/height 属性剥离与图片路径修复在同一遍扫描里分派处理
+        def fix_image_artifact(m):
+            if m.group("wh") is not None:
+                return ''
+            alt = m.group("alt")
+            path = m.group("path")
 
             # 用映射表替换（优先匹配长路径）
-            for old_path, new_path in sorted(mapping.items(), key=lambda x: -len(x[0])):
-                if old_path in path:
-                    path = path.replace(old_path, new_path)
-                    break
+            if mapping_pattern:
+                hit = mapping_pattern.search(path)
+                if hit:
+                    path = path.replace(hit.group(0), mapping[hit.group(0)])
 
             # 通用修复：media/media/xxx → images/xxx
-            path = re.sub(
-                r'media/media/(\w+\.\w+)',
-                lambda mm: f"{self.image_dir}/{mm.group(1)}",
+            path = _RE_MEDIA_MEDIA.sub(
+                lambda mm: f"{image_dir_prefix}{mm.group(1)}",
                 path,
             )
 
             # 防止 images/images/ 双重路径
-            while f"{self.image_dir}/{self.image_dir}/" in path:
-                path = path.replace(f"{self.image_dir}/{self.image_dir}/", f"{self.image_dir}/")
+            while doubled_prefix in path:
+                path = path.replace(doubled_prefix, image_dir_prefix)
 
             # 去掉 images/ 之前的多余路径前缀（如 output/xxx/.work/images/xxx → images/xxx）
-            img_dir_pos = path.find(f"{self.image_dir}/")
+            img_dir_pos = path.find(image_dir_prefix)
             if img_dir_pos > 0:
                 path = path[img_dir_pos:]
 
             return f"![{alt}]({path})"
 
-        result = re.sub(r'!\[([^\]]*)\]\(([^)]+)\)', replace_image_path, result)
-
-        return result
+        return _RE_IMG_FIXUP.sub(fix_image_artifact, markdown)
 
     def _find_content_start(self, raw_md: str) -> int:
         """找到正文开始位置（跳过目录区域）"""
         # 寻找第一个真正的标题（不是目录中的链接）
-        patterns = [
-            r'\n# .+\{#',     # pandoc 生成的带锚点标题
-            r'\n# \d+',        # 数字编号标题
-            r'\n# 引言',       # 常见的中文开头
-            r'\n# Introduction',
-        ]
-
-        for pattern in patterns:
-            match = re.search(pattern, raw_md)
-            if match:
-                return match.start()
+        match = _RE_CONTENT_START.search(raw_md)
+        if match:
+            return match.start()
 
-        # fallback：跳过前 20% 或找到 "---" 分隔
+        # 找不到候选标题时从头开始
         return 0
 
     def _clean_output(self, markdown: str) -> str:
         """清理 AI 输出"""
         # 去掉 AI 可能包裹的外层 ```markdown ``` 标记
-        markdown = re.sub(r'^```markdown\s*\n', '', markdown)
-        markdown = re.sub(r'\n```\s*$', '', markdown)
+        # 先用 startswith/endswith 粗筛，常见的无包裹路径完全不进正则引擎
+        if markdown.startswith("```markdown"):
+            markdown = _RE_MD_FENCE_OPEN.sub('', markdown, count=1)
+        tail_trimmed = markdown.rstrip()
+        if tail_trimmed.endswith("\n```"):
+            markdown = tail_trimmed[:-4]
 
         # 合并被分片截断的相邻 JSON 代码块
         markdown = self._merge_broken_json_blocks(markdown)
@@ -3817,7 +4710,7 @@ class Doc2MDAgent:
             )
 
         # 去掉连续多个空行
-        markdown = re.sub(r'\n{4,}', '\n\n\n', markdown)
+        markdown = _RE_BLANK_RUN.sub('\n\n\n', markdown)
 
         return markdown.strip() + "\n"
 
@@ -3825,7 +4718,8 @@ class Doc2MDAgent:
         """合并被分片截断导致分裂的相邻 JSON 代码块"""
         # 匹配: ```json ... ``` 紧接着 ```json ... ```（中间只有空行）
         # 将它们合并为一个代码块
-        pattern = r'```\s*\n\s*\n*```json\s*\n'
-        while re.search(pattern, markdown):
-            markdown = re.sub(pattern, '\n', markdown)
-        return markdown
+        # subn 一次完成查找+替换；仅当替换产生了新的相邻对时才需要再来一遍
+        while True:
+            markdown, merged = _RE_MERGE_BROKEN_JSON.subn('\n', markdown)
+            if not merged:
+                return markdown
@@ -7,6 +7,7 @@ Anthropic 是唯一的例外，需要单独处理。
 
 import os
 import logging
+import threading
 import time
 from typing import Any, Callable, Optional
 from openai import OpenAI
@@ -39,6 +40,8 @@ class LLMProvider:
         self.max_tokens = provider_conf.get("max_tokens", 16000)
         self.temperature = provider_conf.get("temperature", 0)
         self.call_count = 0
+        # 分片并发转换时多个线程共享同一个 provider，计数与费用累计需要加锁
+        self._usage_lock = threading.Lock()
 
         # Token 用量统计
         self.total_usage = {
@@ -159,12 +162,13 @@ class LLMProvider:
         output_cost = (completion_tokens * self._output_price) / 1_000_000
         total_cost = input_cost + output_cost
 
-        self.total_usage["prompt_tokens"] += prompt_tokens
-        self.total_usage["completion_tokens"] += completion_tokens
-        self.total_usage["input_cost"] += input_cost
-        self.total_usage["output_cost"] += output_cost
-        self.total_usage["total_cost"] += total_cost
-        self.total_usage["calls"] += 1
+        with self._usage_lock:
+            self.total_usage["prompt_tokens"] += prompt_tokens
+            self.total_usage["completion_tokens"] += completion_tokens
+            self.total_usage["input_cost"] += input_cost
+            self.total_usage["output_cost"] += output_cost
+            self.total_usage["total_cost"] += total_cost
+            self.total_usage["calls"] += 1
         logger.info(
             "本次用量: 输入=%s 输出=%s tokens, 费用=%s%.6f",
             prompt_tokens,
@@ -210,8 +214,9 @@ class LLMProvider:
         :return: 带元信息的 AI 回复
         """
         context = context or {}
-        self.call_count += 1
-        call_id = self.call_count
+        with self._usage_lock:
+            self.call_count += 1
+            call_id = self.call_count
         operation_desc = self._describe_operation(context)
 
         logger.info(f"调用 [{self.provider_name}] 模型: {self.model}")
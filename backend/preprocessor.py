@@ -3,7 +3,6 @@
 负责：docx → 粗糙 markdown 提取、图片提取、内容分片
 """
 
-import os
 import re
 import shutil
 import subprocess
@@ -13,6 +12,11 @@ from typing import List, Tuple
 
 logger = logging.getLogger(__name__)
 
+# 单列表格边框：允许 pandoc 对齐语法中的冒号（如 +:-----+）
+_SINGLE_COL_BORDER = re.compile(r'^\+[=:\-]+\+$')
+# 单列表格行：| ... |
+_CELL_ROW = re.compile(r'^\|\s?(.*?)\s*\|$')
+
 
 class DocPreprocessor:
     """文档预处理：提取内容和图片"""
@@ -76,7 +80,9 @@ class DocPreprocessor:
 
         # 读取提取的 markdown
         raw_md = self.raw_md_path.read_text(encoding="utf-8")
-        logger.info(f"提取完成，共 {len(raw_md)} 字符，{raw_md.count(chr(10))} 行")
+        # f-string 表达式里不能写 \n（3.12 之前），行数先算好再格式化
+        line_count = raw_md.count("\n") + 1
+        logger.info(f"提取完成，共 {len(raw_md)} 字符，{line_count} 行")
 
         # 收集提取的图片
         images = self._collect_images()
@@ -156,6 +162,12 @@ class DocPreprocessor:
 
 
 def fix_pandoc_table_codeblocks(text: str) -> str:
+    """同 fix_pandoc_table_codeblocks_with_stats，仅返回修复后的文本。"""
+    fixed, _ = fix_pandoc_table_codeblocks_with_stats(text)
+    return fixed
+
+
+def fix_pandoc_table_codeblocks_with_stats(text: str) -> Tuple[str, int]:
     """
     将 pandoc 提取的单列表格（+---+ | content | 格式）中包含的
     JSON / 代码内容，转换为标准 Markdown 代码块。
@@ -167,20 +179,19 @@ def fix_pandoc_table_codeblocks(text: str) -> str:
     | }     |
     +-------+
     本函数将其识别并转为 ```json ... ``` 格式。
+    :return: (修复后的文本, 新生成的 json 代码块数量)
     """
     lines = text.split("\n")
     result = []
+    json_blocks_added = 0
     i = 0
 
-    # 单列表格边框：允许 pandoc 对齐语法中的冒号（如 +:-----+）
-    single_col_border = re.compile(r'^\+[=:\-]+\+$')
-
     while i < len(lines):
         line = lines[i]
 
         # 只匹配单列表格边框：仅首尾两个 +，中间全是 - 或 =
         # 多列表格如 +---+---+---+ 中间有额外的 +，不匹配
-        if single_col_border.match(line.strip()):
+        if _SINGLE_COL_BORDER.match(line.strip()):
             # 记住起始位置，解析失败时可以回退
             start_i = i
             table_content_lines = []
@@ -188,11 +199,11 @@ def fix_pandoc_table_codeblocks(text: str) -> str:
             while i < len(lines):
                 row = lines[i]
                 # 同样只匹配单列结束边框
-                if single_col_border.match(row.strip()):
+                if _SINGLE_COL_BORDER.match(row.strip()):
                     i += 1
                     break  # 表格结束
                 # 提取 | ... | 中的内容
-                cell_match = re.match(r'^\|\s?(.*?)\s*\|$', row)
+                cell_match = _CELL_ROW.match(row)
                 if cell_match:
                     cell_text = cell_match.group(1).rstrip()
                     table_content_lines.append(cell_text)
@@ -218,6 +229,7 @@ def fix_pandoc_table_codeblocks(text: str) -> str:
                 stripped = content.strip()
                 if stripped.startswith('{') or stripped.startswith('['):
                     result.append(f"```json\n{content}\n```")
+                    json_blocks_added += 1
                 elif stripped.startswith('curl ') or stripped.startswith('curl\n'):
                     result.append(f"```bash\n{content}\n```")
                 else:
@@ -232,21 +244,34 @@ def fix_pandoc_table_codeblocks(text: str) -> str:
         result.append(line)
         i += 1
 
-    return "\n".join(result)
+    return "\n".join(result), json_blocks_added
+
+
+# 一级标题行（与 agent 中 chunk_has_heading 的判定保持一致）
+_H1_LINE = re.compile(r'^\s*#\s+')
+_H1_LINE_M = re.compile(r'^\s*#\s+', re.MULTILINE)
 
 
 def split_content(text: str, chunk_size: int = 8000) -> List[str]:
+    """同 split_content_with_headings，仅返回分片文本。"""
+    return [chunk for chunk, _ in split_content_with_headings(text, chunk_size)]
+
+
+def split_content_with_headings(text: str, chunk_size: int = 8000) -> List[Tuple[str, bool]]:
     """
     按章节边界智能分片
     优先在标题行处切分，避免截断段落和代码块
+    :return: (分片文本, 分片内是否含一级标题) 列表，
+             标题标记在分片时顺带记录，调用方无需再整片扫描一次
     """
     if len(text) <= chunk_size:
-        return [text]
+        return [(text, bool(_H1_LINE_M.search(text)))]
 
     chunks = []
     lines = text.split("\n")
     current_chunk = []
     current_size = 0
+    current_has_heading = False
     in_code_block = False  # 跟踪是否在代码块内
 
     for line in lines:
@@ -259,15 +284,18 @@ def split_content(text: str, chunk_size: int = 8000) -> List[str]:
         # 如果当前块已经够大，且不在代码块内，才允许切分
         if not in_code_block and current_size + line_size > chunk_size and current_size > 0:
             if line.startswith("#") or (current_size > chunk_size * 0.8):
-                chunks.append("\n".join(current_chunk))
+                chunks.append(("\n".join(current_chunk), current_has_heading))
                 current_chunk = []
                 current_size = 0
+                current_has_heading = False
 
         current_chunk.append(line)
         current_size += line_size
+        if not current_has_heading and _H1_LINE.match(line):
+            current_has_heading = True
 
     if current_chunk:
-        chunks.append("\n".join(current_chunk))
+        chunks.append(("\n".join(current_chunk), current_has_heading))
 
     logger.info(f"内容分为 {len(chunks)} 个片段")
     return chunks
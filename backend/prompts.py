@@ -109,6 +109,31 @@ CONVERT_USER = """请将以下粗糙 Markdown 转换为美观的专业文档。
 请直接输出转换后的 Markdown，不要任何额外解释。"""
 
 
+CONVERT_BATCH_SYSTEM = CONVERT_SYSTEM + """
+## 批量片段规则
+- 输入包含多个独立片段，每个片段用 `<<<CHUNK id=N>>>` 与 `<<<END id=N>>>` 包裹。
+- 每个片段按各自约束单独整理，禁止跨片段合并、移动或补全内容。
+- 必须逐片段返回结果：每个片段的输出用 `<<<OUT id=N>>>` 与 `<<<ENDOUT id=N>>>` 包裹，id 与输入一一对应，不得遗漏或新增。
+- 包裹标记行单独成行，标记之间只输出该片段转换后的 Markdown。
+"""
+
+CONVERT_BATCH_USER = """请将以下多个粗糙 Markdown 片段分别转换为美观的专业文档。
+
+文档结构分析：
+```json
+{structure}
+```
+
+各片段约束：
+{jobs_overview}
+
+需要转换的片段（共 {job_count} 个）：
+
+{content}
+
+请按 `<<<OUT id=N>>>`...`<<<ENDOUT id=N>>>` 的格式逐片段输出转换结果，不要任何额外解释。"""
+
+
 # ============================================================
 # 第三阶段：生成目录
 # ============================================================
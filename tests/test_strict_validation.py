@@ -44,6 +44,50 @@ def test_extract_expected_headings_from_toc():
     assert headings == ["1 引言", "1.1 目的", "2 接口设计"]
 
 
+def test_plan_chunk_batches_groups_small_chunks_and_isolates_json():
+    agent = make_agent()
+    agent.max_batch_chunks = 3
+    jobs = [
+        {"content": "小片段一"},
+        {"content": "小片段二"},
+        {"content": "```json\n{\"code\": \"0\"}\n```"},
+        {"content": "小片段三"},
+        {"content": "小片段四"},
+    ]
+    batches = agent._plan_chunk_batches(jobs)
+    assert batches == [[0, 1], [2], [3, 4]]
+
+
+def test_plan_chunk_batches_disabled_keeps_single_chunks():
+    agent = make_agent()
+    assert agent.max_batch_chunks == 1
+    jobs = [{"content": "片段一"}, {"content": "片段二"}]
+    assert agent._plan_chunk_batches(jobs) == [[0], [1]]
+
+
+def test_chat_with_meta_cached_reuses_disk_cache(tmp_path, monkeypatch):
+    agent = make_agent()
+    agent.cache_enabled = True
+    agent._llm_cache_dir = tmp_path / "llm_cache"
+
+    calls = []
+
+    def fake_chat_with_meta(system_prompt, user_prompt, context=None):
+        calls.append(user_prompt)
+        return {"content": "转换结果", "truncated": False, "finish_reason": "stop"}
+
+    monkeypatch.setattr(agent.llm, "chat_with_meta", fake_chat_with_meta)
+
+    first = agent._chat_with_meta_cached("system", "prompt")
+    second = agent._chat_with_meta_cached("system", "prompt")
+    assert first["content"] == second["content"] == "转换结果"
+    assert len(calls) == 1
+
+    # 跳过缓存时必须重新调用模型
+    agent._chat_with_meta_cached("system", "prompt", use_cache=False)
+    assert len(calls) == 2
+
+
 def test_validate_chunk_output_rejects_heading_in_continuation():
     agent = make_agent()
     ok, reason = agent._validate_chunk_output(